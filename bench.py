@@ -0,0 +1,304 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from cards import (
+    BLACK_JOKER, CARD_NAME, GONGZHU_DECK, RED_JOKER,
+    create_deck, format_gongzhu_hand, format_landlord_hand, get_card_value, hand_cards, hand_mask, parse_cards,
+)
+from gongzhu import MATCH_LIMIT, gongzhu_play, legal_cards, new_gongzhu_game, trick_winner
+from landlord import classify, legal_moves, new_landlord_game, parse_play
+from landlord_ai import quick_move
+from outbox import FakeTransport, Pipeline, RateLimiter
+from replay import STARTS, ReplayPlayer, decode_moves, encode_header, encode_move, summarize
+from simulate import play_bmb, play_gongzhu, play_landlord
+
+# --- Benchmarks ---
+# Standalone harness for the card engine and command hot paths. Each case is
+# run in a timed loop several times, each time followed by a fixed
+# calibration loop that touches none of the engine. The median speed relative
+# to that loop is what bench_baseline.json stores, so the baseline carries
+# over between machines. Any case slower than the baseline by more than
+# --tolerance is reported as a regression (exit status 1).
+#
+#   python bench.py              # run and compare
+#   python bench.py --save       # run and store as the new baseline
+#   python bench.py -k landlord  # only cases whose name contains "landlord"
+#
+# The command cases drive the real !pl / !pg callbacks from cogs/ with a
+# mocked context and a fake transport; they are skipped when discord.py
+# isn't installed.
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+MIN_TIME = 0.1
+REPEAT = 9
+
+
+def measure(func, min_time=MIN_TIME, repeat=REPEAT):
+    # best ops/sec over `repeat` runs of at least `min_time` seconds each
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        if time.perf_counter() - started >= min_time / 10:
+            break
+        loops *= 2
+    best = 0.0
+    for _ in range(repeat):
+        done = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < min_time:
+            for _ in range(loops):
+                func()
+            done += loops
+        best = max(best, done / (time.perf_counter() - started))
+    return best
+
+
+def measure_relative(func, min_time=MIN_TIME, repeat=REPEAT):
+    # (best ops/sec, median speed relative to the calibration loop). Each round
+    # times the case and then the calibration loop right after it, so the host
+    # slowing down or speeding up moves both numbers together
+    best = 0.0
+    ratios = []
+    for _ in range(repeat):
+        ops = measure(func, min_time, 1)
+        ratios.append(ops / measure(calibration, min_time, 1))
+        best = max(best, ops)
+    return best, statistics.median(ratios)
+
+
+def calibration():
+    # plain int, dict and list work of the kind the engine does, with none of its code
+    total = 0
+    seen = {}
+    for i in range(256):
+        mask = i * 0x9E3779B97F4A7C15 & 0xFFFFFFFFFFFFF
+        total += (mask & -mask).bit_length() + mask.bit_count()
+        seen[i & 63] = total
+    return sorted(seen.values())
+
+
+# --- engine cases ---
+def engine_cases():
+    rng = random.Random(1)
+    deck = create_deck(rng=rng)
+    landlord_hand = hand_mask(deck[:18])
+    gongzhu_hand = hand_mask(GONGZHU_DECK[:14])
+    tokens = ["3d", "3h", "10s", "Qc", "bj"]
+    cards = hand_cards(landlord_hand)
+    lead = classify(take_single(landlord_hand))
+
+    cases = {
+        "deal landlord 3p": lambda: new_landlord_game(range(3), rng),
+        "deal gongzhu 4p": lambda: new_gongzhu_game(range(4), rng),
+        "create deck": lambda: create_deck(rng=rng),
+        "parse cards": lambda: parse_cards(tokens),
+        "parse play ranks": lambda: parse_play(landlord_hand | 0xF, ["3", "3"]),
+        "format landlord hand": lambda: format_landlord_hand(landlord_hand),
+        "format gongzhu hand": lambda: format_gongzhu_hand(gongzhu_hand),
+        "render landlord hand": lambda: format_landlord_hand.__wrapped__(landlord_hand),
+        "render gongzhu hand": lambda: format_gongzhu_hand.__wrapped__(gongzhu_hand),
+        "card value": lambda: [get_card_value(c) for c in cards],
+        "classify": lambda: classify(landlord_hand & 0xFFF),
+        "legal moves lead": lambda: legal_moves(landlord_hand),
+        "legal moves follow": lambda: legal_moves(landlord_hand, lead),
+        "gongzhu trick winner": lambda: trick_winner([(0, 36), (1, 40), (2, 32), (3, 17)], 0),
+    }
+    for players in (3, 4, 5):
+        cases[f"landlord game {players}p"] = game_case(play_landlord, players)
+        cases[f"gongzhu game {players}p"] = game_case(play_gongzhu, players)
+    cases["bmb game"] = game_case(play_bmb, 2)
+
+    header, moves = recorded_gongzhu(random.Random(2), 4)
+    data = encode_replay(header, moves)
+    cases["replay encode gongzhu"] = lambda: encode_replay(header, moves)
+    cases["replay decode gongzhu"] = lambda: list(decode_moves(data, "gongzhu", len(header)))
+    cases["replay summary gongzhu"] = lambda: list(summarize(data))
+    return cases
+
+
+def recorded_gongzhu(rng, players):
+    # a whole match as (replay header, moves)
+    seed = rng.getrandbits(63)
+    names = [(i + 1, f"Player {i + 1}") for i in range(players)]
+    state = STARTS["gongzhu"]([ReplayPlayer(*p) for p in names], seed, MATCH_LIMIT)
+    moves = []
+    while not state.finished:
+        seat = state.turn
+        card = rng.choice(hand_cards(legal_cards(state, seat)))
+        gongzhu_play(state, seat, card)
+        moves.append((seat, card))
+    return encode_header("gongzhu", seed, names, MATCH_LIMIT), moves
+
+
+def encode_replay(header, moves):
+    out = bytearray(header)
+    for seat, card in moves:
+        encode_move(out, "gongzhu", "play", seat, card)
+    return out
+
+
+def take_single(hand):
+    return hand & -hand
+
+
+def game_case(play, players):
+    counter = iter(range(10 ** 12))
+    return lambda: play(random.Random(next(counter)), players)
+
+
+# --- command cases ---
+class FakeMember:
+    def __init__(self, member_id):
+        self.id = member_id
+        self.display_name = f"Player {member_id}"
+        self.mention = f"<@{member_id}>"
+
+    async def send(self, content, **kwargs):
+        pass
+
+
+class FakeGuild:
+    id = 1
+
+
+class FakeChannel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+
+    async def send(self, content, **kwargs):
+        return None  # no status message to edit later
+
+
+class FakeContext:
+    def __init__(self, pipeline, author, channel):
+        self.author = author
+        self.guild = FakeGuild()
+        self.channel = channel
+        self.outbox = pipeline.outbox(self)
+
+    async def send(self, content, **kwargs):
+        pass
+
+
+def input_text(play):
+    names = {BLACK_JOKER: "BJ", RED_JOKER: "RJ"}
+    return " ".join(names.get(c, CARD_NAME[c]) for c in hand_cards(play))
+
+
+def command_cases():
+    try:
+        os.environ.setdefault("GAME_DB", os.path.join(tempfile.mkdtemp(), "bench.db"))
+        import tables
+        from cogs import gongzhu as gongzhu_cog, landlord as landlord_cog
+        from ui import refresh_status
+    except ImportError as e:
+        print(f"skipping command benchmarks ({e})", file=sys.stderr)
+        return {}
+
+    loop = asyncio.new_event_loop()
+    transport = FakeTransport()
+    pipeline = Pipeline(transport, RateLimiter(rate=10 ** 9, per=1.0, global_rate=10 ** 9))
+    channels = iter(range(1, 10 ** 12))
+
+    def landlord_turns(players):
+        members = [FakeMember(i + 1) for i in range(players)]
+
+        async def play_game():
+            channel = FakeChannel(next(channels))
+            key = (FakeGuild.id, channel.id)
+            table = new_landlord_game(members, random.Random(channel.id))
+            tables.landlord_tables[key] = table
+            while key in tables.landlord_tables:
+                seat = table.turn
+                ctx = FakeContext(pipeline, members[seat], channel)
+                last = table.last_play[2] if table.last_play else None
+                move = quick_move(table.hands[seat], last)
+                if move:
+                    await landlord_cog.pl.callback(ctx, cards=input_text(move))
+                else:
+                    await landlord_cog.xl.callback(ctx)
+                await ctx.outbox.flush()
+                await refresh_status(key)
+            transport.sent.clear()
+
+        return lambda: loop.run_until_complete(play_game())
+
+    def gongzhu_turns(players):
+        members = [FakeMember(i + 1) for i in range(players)]
+
+        async def play_game():
+            channel = FakeChannel(next(channels))
+            key = (FakeGuild.id, channel.id)
+            rng = random.Random(channel.id)
+            table = new_gongzhu_game(members, rng)
+            tables.gongzhu_tables[key] = table
+            while key in tables.gongzhu_tables:
+                seat = table.turn
+                ctx = FakeContext(pipeline, members[seat], channel)
+                card = rng.choice(hand_cards(legal_cards(table, seat)))
+                await gongzhu_cog.pg.callback(ctx, card=CARD_NAME[card])
+                await ctx.outbox.flush()
+                await refresh_status(key)
+            transport.sent.clear()
+
+        return lambda: loop.run_until_complete(play_game())
+
+    cases = {}
+    for players in (3, 4, 5):
+        cases[f"!pl game {players}p"] = landlord_turns(players)
+        cases[f"!pg game {players}p"] = gongzhu_turns(players)
+    return cases
+# ----------------------------------
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Card engine and command benchmarks")
+    parser.add_argument("-k", dest="pattern", default="", help="only run cases containing this text")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before flagging (0.2 = 20%%)")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    args = parser.parse_args()
+
+    cases = {**engine_cases(), **command_cases()}
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+    for name, func in cases.items():
+        if args.pattern not in name:
+            continue
+        ops, relative = measure_relative(func)
+        results[name] = relative
+        line = f"{name:<24} {ops:>14,.1f} ops/s  {relative:>10.4f}x cal"
+        if name in baseline:
+            change = relative / baseline[name] - 1
+            line += f"  {change:+.1%}"
+            if change < -args.tolerance:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+        print(f"saved baseline to {args.baseline}")
+    elif regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import random
+
+from cards import CARD_VALUE, IllegalMove
+from deal import shuffled
+
+try:
+    import numpy as np
+except ImportError:  # the pure Python table below gives the same numbers
+    np = None
+
+# --- Blind Man's Bluff rules ---
+# Two seats (0 and 1). Each seat sees only the other seat's card; the higher
+# card takes the pot at showdown.
+#
+# Betting is a small state machine. `phase` says where the round stands and
+# LEGAL_ACTIONS lists what the seat to act may do from there:
+#   OPEN          nobody has bet yet: check, raise or fold
+#   CHECKED_TO    the other seat checked: check (showdown), raise or fold
+#   FACING_RAISE  the other seat raised: call (showdown), re-raise or fold
+#   OVER          someone is out of chips; nothing is legal
+# On top of that a raise needs the chips to cover it and an opponent who still
+# has chips behind.
+
+BMB_ANTE = 5
+STARTING_CHIPS = 100
+
+OPEN = "open"
+CHECKED_TO = "checked_to"
+FACING_RAISE = "facing_raise"
+OVER = "over"
+
+CHECK = "check"
+CALL = "call"
+RAISE = "raise"
+FOLD = "fold"
+
+LEGAL_ACTIONS = {
+    OPEN: (CHECK, RAISE, FOLD),
+    CHECKED_TO: (CHECK, RAISE, FOLD),
+    FACING_RAISE: (CALL, RAISE, FOLD),
+    OVER: (),
+}
+
+RAISED = "raised"
+CHECKED = "checked"
+SHOWDOWN = "showdown"
+WON_SHORT = "won_short"
+WON_POT = "won_pot"
+SPLIT = "split"
+FOLDED = "folded"
+CHIPS = "chips"
+NEW_ROUND = "new_round"
+GAME_OVER = "game_over"
+
+
+class BMBState:
+    def __init__(self, players, rng):
+        self.players = players
+        self.chips = [STARTING_CHIPS, STARTING_CHIPS]
+        self.turn = 0
+        self.phase = OPEN
+        self.pot = 0
+        self.price = 0
+        self.cards = [None, None]
+        self.bets = [0, 0]
+        self.last_raiser = None
+        self.winner = None
+        self.rng = rng
+
+
+def deal_bmb_cards(state):
+    state.cards = shuffled(range(52), state.rng, 2)
+
+
+def new_bmb_game(players, rng=None):
+    # the state keeps its own rng for later rounds, so it can be snapshotted
+    state = BMBState(list(players), rng or random.Random())
+    start_new_bmb_round(state)
+    return state
+
+
+def start_new_bmb_round(state):
+    state.turn = 0
+    state.phase = OPEN
+    state.pot = 0
+    state.price = 0
+    state.bets = [0, 0]
+    state.last_raiser = None
+
+    for seat in (0, 1):
+        ante = min(BMB_ANTE, state.chips[seat])
+        state.chips[seat] -= ante
+        state.pot += ante
+        state.bets[seat] = ante
+
+    deal_bmb_cards(state)
+
+
+def legal_actions(state, seat):
+    if seat != state.turn:
+        return ()
+    actions = LEGAL_ACTIONS[state.phase]
+    opponent = 1 - seat
+    to_call = state.bets[opponent] - state.bets[seat]
+    if RAISE in actions and (state.chips[seat] < to_call + BMB_ANTE or not state.chips[opponent]):
+        actions = tuple(a for a in actions if a != RAISE)
+    return actions
+
+
+def _require(state, seat, action):
+    if state.phase == OVER or seat != state.turn:
+        raise IllegalMove("it's not your turn.")
+    if action not in LEGAL_ACTIONS[state.phase]:
+        raise IllegalMove(f"you can't {action} now, you can {', '.join(LEGAL_ACTIONS[state.phase])}.")
+
+
+def bmb_raise(state, seat, amount):
+    _require(state, seat, RAISE)
+    if amount < BMB_ANTE:
+        raise IllegalMove(f"you have to raise at least the ante, which is {BMB_ANTE}.")
+
+    opponent = 1 - seat
+    if not state.chips[opponent]:
+        raise IllegalMove("the other player is all in, you can only call or fold.")
+    to_call = state.bets[opponent] - state.bets[seat]
+
+    total_required = to_call + amount
+    if state.chips[seat] < total_required:
+        raise IllegalMove(f"you need {total_required} chips to call and raise, but only have {state.chips[seat]}.")
+
+    state.chips[seat] -= total_required
+    state.bets[seat] += total_required
+    state.pot += total_required
+    state.price = state.bets[seat] - state.bets[opponent]
+    state.last_raiser = seat
+    state.phase = FACING_RAISE
+    state.turn = opponent
+    return [(RAISED, seat, amount, to_call)]
+
+
+def bmb_check(state, seat):
+    _require(state, seat, CHECK)
+    events = [(CHECKED, seat)]
+    if state.phase == OPEN:
+        state.phase = CHECKED_TO
+        state.turn = 1 - seat
+        return events
+    return _showdown(state, events)
+
+
+def bmb_call(state, seat):
+    # !call with nothing to call is a check
+    if state.phase in (OPEN, CHECKED_TO):
+        return bmb_check(state, seat)
+    _require(state, seat, CALL)
+    opponent = 1 - seat
+    call_amount = min(state.chips[seat], state.bets[opponent] - state.bets[seat])
+    state.chips[seat] -= call_amount
+    state.bets[seat] += call_amount
+    state.pot += call_amount
+    return _showdown(state, [])
+
+
+def _showdown(state, events):
+    events.append((SHOWDOWN, state.cards[0], state.cards[1]))
+    val1 = CARD_VALUE[state.cards[0]]
+    val2 = CARD_VALUE[state.cards[1]]
+
+    if val1 > val2:
+        winner = 0
+    elif val2 > val1:
+        winner = 1
+    else:
+        winner = None
+
+    if winner is None:
+        state.chips[0] += state.pot // 2
+        state.chips[1] += state.pot - (state.pot // 2)
+        events.append((SPLIT,))
+    elif state.bets[winner] < state.bets[1 - winner]:
+        # a short-stacked winner only wins what it matched; the rest goes back
+        win_amount = 2 * state.bets[winner]
+        state.chips[winner] += win_amount
+        state.chips[1 - winner] += state.pot - win_amount
+        events.append((WON_SHORT, winner, win_amount))
+    else:
+        state.chips[winner] += state.pot
+        events.append((WON_POT, winner, state.pot))
+    return _finish_round(state, events)
+
+
+def bmb_fold(state, seat):
+    _require(state, seat, FOLD)
+    winner = 1 - seat
+    state.chips[winner] += state.pot
+    return _finish_round(state, [(FOLDED, seat, winner, state.pot)])
+
+
+def _finish_round(state, events):
+    state.pot = 0
+    events.append((CHIPS,))
+    for loser in (0, 1):
+        if state.chips[loser] <= 0:
+            state.winner = 1 - loser
+            state.phase = OVER
+            events.append((GAME_OVER, loser, state.winner))
+            return events
+    start_new_bmb_round(state)
+    events.append((NEW_ROUND,))
+    return events
+
+
+ACTIONS = {CHECK: bmb_check, CALL: bmb_call, RAISE: bmb_raise, FOLD: bmb_fold}
+
+
+# --- Equity ---
+# A seat's chance at showdown only depends on the card it can see: its own
+# card is any of the other 51, and it wins whenever that card is the higher
+# one (a tie splits the pot, so it counts half). EQUITY[card] is that chance for every
+# card a seat might see, built in one go as a 52x52 comparison, so using it
+# during play is a list lookup.
+
+def equity_table():
+    values = CARD_VALUE[:52]
+    if np is not None:
+        v = np.array(values)
+        # column j counts the cards above / level with the seen card j
+        higher = (v[:, None] > v[None, :]).sum(axis=0)
+        ties = (v[:, None] == v[None, :]).sum(axis=0) - 1
+        return ((higher + ties / 2) / 51).tolist()
+    return [(sum(w > v for w in values) + (values.count(v) - 1) / 2) / 51 for v in values]
+
+
+EQUITY = equity_table()
+
+
+def win_chance(state, seat):
+    return EQUITY[state.cards[1 - seat]]
+
+
+# --- Bot opponent ---
+BOT_RAISE_EQUITY = 0.65
+
+
+def bot_action(state, seat):
+    # (action, args): raise good spots, check when it's free, call when the
+    # pot pays for the risk, fold otherwise
+    legal = legal_actions(state, seat)
+    chance = win_chance(state, seat)
+    if RAISE in legal and chance >= BOT_RAISE_EQUITY:
+        return RAISE, (BMB_ANTE,)
+    if CHECK in legal:
+        return CHECK, ()
+    to_call = state.bets[1 - seat] - state.bets[seat]
+    if chance * (state.pot + to_call) >= to_call:
+        return CALL, ()
+    return FOLD, ()
+# ----------------------------------
@@ -0,0 +1,183 @@
+import random
+from functools import lru_cache
+
+from deal import shuffled
+
+# --- Card encoding ---
+# A card is a small int. The 52 suited cards are `rank_index * 4 + suit_index`
+# (ranks in Landlord order 3..2, suits in suit_map order), followed by the two
+# jokers. Ascending ids are therefore already in Landlord hand order, and every
+# property of a card is a lookup into the tables below. Card names are only
+# built when a message goes out to Discord.
+suit_map = {
+    'd': '♦',  # Diamonds
+    'h': '♥',  # Hearts
+    'c': '♣',  # Clubs
+    's': '♠',  # Spades
+}
+suits = list(suit_map.values())
+
+ranks = ['3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A', '2']
+jokers = ['Black Joker', 'Red Joker']
+
+DIAMONDS, HEARTS, CLUBS, SPADES = range(4)
+BLACK_JOKER = 52
+RED_JOKER = 53
+DECK_SIZE = 54
+FULL_DECK = (1 << DECK_SIZE) - 1
+
+RANK_INDEX = {r: i for i, r in enumerate(ranks)}
+
+# rank index per card; the jokers get their own ranks above '2'
+CARD_RANK = [i // 4 for i in range(52)] + [13, 14]
+# suit index per card, -1 for the jokers
+CARD_SUIT = [i % 4 for i in range(52)] + [-1, -1]
+CARD_NAME = [f"{ranks[i // 4]}{suits[i % 4]}" for i in range(52)] + jokers
+
+# Trick/showdown value: 2 is low, A is high (jokers never take part)
+_face_value = {'2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7,
+               '8': 8, '9': 9, '10': 10, 'J': 11, 'Q': 12, 'K': 13, 'A': 14}
+CARD_VALUE = [_face_value[ranks[i // 4]] for i in range(52)] + [15, 16]
+
+# Gongzhu hand order: suit (♠ ♥ ♦ ♣) then value
+GONGZHU_SUIT_ORDER = (SPADES, HEARTS, DIAMONDS, CLUBS)
+
+# Every accepted spelling of a card: rank followed by a suit letter (any case)
+# or suit symbol, plus BJ/RJ for the jokers.
+PARSE_TABLE = {'BJ': BLACK_JOKER, 'RJ': RED_JOKER}
+for _r, _rank in enumerate(ranks):
+    for _s, (_code, _symbol) in enumerate(suit_map.items()):
+        for _suffix in (_code, _code.upper(), _symbol):
+            PARSE_TABLE[f"{_rank}{_suffix}"] = _r * 4 + _s
+
+# Gongzhu special cards
+PIG = PARSE_TABLE['Qs']
+SHEEP = PARSE_TABLE['Jd']
+TRANSFORMER = PARSE_TABLE['10c']
+
+GONGZHU_DECK = [c for c in range(52) if ranks[CARD_RANK[c]] not in ('2', '3')]
+
+# --- Hand masks ---
+# A hand is an int with bit `card` set for every card held, so ownership
+# checks, removals and per-rank/per-suit counts are a few bit operations
+# regardless of hand size.
+RANK_MASK = [0xF << (r * 4) for r in range(13)] + [1 << BLACK_JOKER, 1 << RED_JOKER]
+SUIT_MASK = [sum(1 << c for c in range(52) if c % 4 == s) for s in range(4)]
+
+# TAKE_LOWEST[nibble][n] is the n lowest set bits of a 4-bit rank group, or 0
+# when the group holds fewer than n cards.
+TAKE_LOWEST = []
+for _nibble in range(16):
+    _row = [0] * 5
+    _bits = [b for b in range(4) if _nibble >> b & 1]
+    for _n in range(1, len(_bits) + 1):
+        _row[_n] = sum(1 << b for b in _bits[:_n])
+    TAKE_LOWEST.append(_row)
+
+# BYTE_CARDS[i][b] lists the cards set in byte b at byte position i of a mask,
+# and BYTE_TEXT[i][b] is the same cards already rendered, so walking a hand
+# costs one lookup per byte instead of one step per card.
+BYTE_CARDS = [[tuple(i * 8 + bit for bit in range(8) if b >> bit & 1 and i * 8 + bit < DECK_SIZE)
+               for b in range(256)] for i in range(7)]
+BYTE_TEXT = [[' '.join([CARD_NAME[c] for c in cards]) for cards in row] for row in BYTE_CARDS]
+
+HAND_CACHE_SIZE = 8192
+# ----------------------
+
+
+
+
+# --- card creations ---
+
+def create_deck(include_jokers=True, rng=random):
+    return shuffled(range(DECK_SIZE if include_jokers else 52), rng)
+
+def render_cards(cards):
+    return ' '.join([CARD_NAME[c] for c in cards])
+
+def hand_mask(cards):
+    mask = 0
+    for c in cards:
+        mask |= 1 << c
+    return mask
+
+def hand_cards(mask):
+    # cards in ascending id order, i.e. already sorted for Landlord
+    cards = []
+    i = 0
+    while mask:
+        byte = mask & 0xFF
+        if byte:
+            cards += BYTE_CARDS[i][byte]
+        mask >>= 8
+        i += 1
+    return cards
+
+def _render_mask(mask):
+    parts = []
+    i = 0
+    while mask:
+        byte = mask & 0xFF
+        if byte:
+            parts.append(BYTE_TEXT[i][byte])
+        mask >>= 8
+        i += 1
+    return ' '.join(parts)
+
+def rank_count(mask, rank):
+    return (mask & RANK_MASK[rank]).bit_count()
+
+def suit_count(mask, suit):
+    return (mask & SUIT_MASK[suit]).bit_count()
+
+def take_rank(mask, rank, n):
+    # mask of the n lowest-suited cards of `rank` in the hand, 0 if there aren't enough
+    if n > 4:
+        return 0
+    shift = rank * 4
+    return TAKE_LOWEST[(mask >> shift) & 0xF][n] << shift
+
+# A hand's text only changes when its mask does, so rendered hands are cached
+# by mask: the ephemeral reply, the DM and !hand after a play share one render.
+@lru_cache(maxsize=HAND_CACHE_SIZE)
+def format_landlord_hand(hand):
+    return _render_mask(hand)
+
+@lru_cache(maxsize=HAND_CACHE_SIZE)
+def format_gongzhu_hand(hand, follow=None):
+    # the cards of suit `follow` (the only legal plays) are shown in bold
+    parts = []
+    for suit in GONGZHU_SUIT_ORDER:
+        text = _render_mask(hand & SUIT_MASK[suit])
+        if text:
+            parts.append(f"**{text}**" if suit == follow else text)
+    return ' '.join(parts)
+
+
+def parse_cards(input_cards):
+    parsed = []
+    for c in input_cards:
+        c = c.strip()
+        card = PARSE_TABLE.get(c.upper() if len(c) == 2 and c[-1] in 'jJ' else c)
+        if card is None:
+            return None
+        parsed.append(card)
+    return parsed
+
+def get_card_value(card):
+    return CARD_VALUE[card]
+
+# --------------------------
+
+
+
+
+# --- Rules ---
+# The game modules keep their rules as plain synchronous functions over a
+# state object. A transition either returns the list of events it produced
+# or raises IllegalMove with the message to show the player.
+
+class IllegalMove(Exception):
+    pass
+
+# --------------------------
@@ -0,0 +1,213 @@
+import discord
+from discord.ext import commands
+
+import bmb
+from bmb import (
+    ACTIONS, BMB_ANTE, CALL, CHECK, FOLD, RAISE, STARTING_CHIPS, bmb_call, bmb_fold, bmb_raise, bot_action,
+    legal_actions, new_bmb_game, win_chance,
+)
+from cards import CARD_NAME, IllegalMove
+from deal import new_seed, table_rng
+from tables import (
+    AUTO_MOVES, TABLE_SIZES, TABLE_STARTS, TABLE_STATUS, BotSeat, arm_timer, bmb_tables, end_table, record_move,
+    record_results, seat_of, store, table_key,
+)
+from ui import TABLE_VIEWS, component_move, post_status, seated
+
+# --- BMB Commands ---
+ACTION_HINTS = {CHECK: "`!call` to check", CALL: "`!call`", RAISE: "`!raise <amount>`", FOLD: "`!fold`"}
+
+@commands.command(name="startBMB")
+async def start_ip(ctx, p1: discord.Member, p2: discord.Member = None):
+    key = table_key(ctx)
+    if key in bmb_tables:
+        ctx.outbox.say("A BMB game is already in progress.")
+        return
+
+    # with one player mentioned the bot takes the other seat
+    await start_bmb_table(ctx, key, [p1, p2 or BotSeat(1)])
+
+async def start_bmb_table(ctx, key, players):
+    seed = new_seed()
+    table = new_bmb_game(players, table_rng(seed))
+    bmb_tables[key] = table
+    store.record_deal(key, "bmb", seed, table)
+    store.snapshot(key, "bmb", table)
+    arm_timer("bmb", key)
+
+    send_bmb_cards(ctx, table)
+    ctx.outbox.say(
+        f"Blind Man's Bluff started between {table.players[0].mention} and {table.players[1].mention}!"
+        f" (deal seed {seed})\n"
+        f"Each player antes {BMB_ANTE} chip(s).\n"
+        f"Pot: {table.pot}."
+    )
+    prompt_bmb(ctx, table)
+    await ctx.outbox.flush()
+    await post_status(ctx, "bmb", key)
+    run_bot_turns(ctx, key, table)
+
+def send_bmb_cards(ctx, table):
+    for seat, player in enumerate(table.players):
+        if not isinstance(player, BotSeat):
+            ctx.outbox.dm(player, f"The other player is showing: {CARD_NAME[table.cards[1 - seat]]}")
+
+def prompt_bmb(ctx, table):
+    player = table.players[table.turn]
+    if not isinstance(player, BotSeat):
+        hints = ", ".join(ACTION_HINTS[a] for a in legal_actions(table, table.turn))
+        ctx.outbox.say(f"{player.mention}, your move! Use {hints}.")
+
+def announce_bmb(ctx, key, table, events):
+    p1, p2 = table.players
+    for event in events:
+        kind = event[0]
+        if kind == bmb.RAISED:
+            _, seat, amount, to_call = event
+            ctx.outbox.say(
+                f"{table.players[seat].display_name} raises {amount} chips (calls {to_call}, raises {amount}).\n"
+                f"Current price to call: {table.price}.\nPot: {table.pot}."
+            )
+        elif kind == bmb.CHECKED:
+            ctx.outbox.say(f"{table.players[event[1]].display_name} checks.")
+        elif kind == bmb.SHOWDOWN:
+            _, card1, card2 = event
+            ctx.outbox.say(f"{p1.display_name} had: {CARD_NAME[card1]}\n{p2.display_name} had: {CARD_NAME[card2]}")
+        elif kind == bmb.WON_SHORT:
+            _, winner, win_amount = event
+            ctx.outbox.say(f"{table.players[winner].display_name} wins but didn't match the full raise — they win only {win_amount} chips.")
+        elif kind == bmb.WON_POT:
+            _, winner, pot = event
+            ctx.outbox.say(f"{table.players[winner].display_name} wins the round and takes {pot} chips!")
+        elif kind == bmb.SPLIT:
+            ctx.outbox.say("It's a tie. Pot is split.")
+        elif kind == bmb.FOLDED:
+            _, seat, winner, pot = event
+            ctx.outbox.say(f"{table.players[seat].display_name} folded. {table.players[winner].display_name} wins {pot} chips!")
+        elif kind == bmb.CHIPS:
+            ctx.outbox.say(f"Chips now:\n{p1.display_name}: {table.chips[0]}\n{p2.display_name}: {table.chips[1]}")
+        elif kind == bmb.GAME_OVER:
+            _, loser, winner = event
+            ctx.outbox.say(f"{table.players[loser].display_name} is out of chips. {table.players[winner].display_name} wins the game!")
+            record_results(key, "bmb", table, {winner}, [chips - STARTING_CHIPS for chips in table.chips])
+            end_table("bmb", key)
+            return
+        elif kind == bmb.NEW_ROUND:
+            send_bmb_cards(ctx, table)
+            ctx.outbox.say(f"New round begins! Each player antes {BMB_ANTE} chip(s).\nPot: {table.pot}.")
+    prompt_bmb(ctx, table)
+
+def run_bot_turns(ctx, key, table):
+    # the bot decides from the equity table, so its turns run inline
+    while bmb_tables.get(key) is table and isinstance(table.players[table.turn], BotSeat):
+        seat = table.turn
+        action, args = bot_action(table, seat)
+        events = ACTIONS[action](table, seat, *args)
+        record_move(key, "bmb", table, action, seat, *args)
+        announce_bmb(ctx, key, table, events)
+
+async def bmb_action(ctx, op, action, *args):
+    key = table_key(ctx)
+    table = bmb_tables.get(key)
+
+    seat = seat_of(table, ctx.author) if table else None
+    if seat is None or seat != table.turn:
+        return
+    bmb_move(ctx, key, table, seat, op, action, *args)
+
+def bmb_move(ctx, key, table, seat, op, action, *args):
+    try:
+        events = action(table, seat, *args)
+    except IllegalMove as e:
+        ctx.outbox.say(f"{ctx.author.mention}, {e}")
+        return
+    record_move(key, "bmb", table, op, seat, *args)
+    announce_bmb(ctx, key, table, events)
+    run_bot_turns(ctx, key, table)
+
+@commands.command(name="raise")
+async def bmb_raise_cmd(ctx, amount: int = BMB_ANTE):
+    await bmb_action(ctx, "raise", bmb_raise, amount)
+
+@commands.command(name="call")
+async def bmb_call_cmd(ctx):
+    await bmb_action(ctx, "call", bmb_call)
+
+@commands.command(name="fold")
+async def bmb_fold_cmd(ctx):
+    await bmb_action(ctx, "fold", bmb_fold)
+
+@commands.hybrid_command(name="odds", description="Your chance to win the Blind Man's Bluff showdown")
+async def odds(ctx):
+    table = bmb_tables.get(table_key(ctx))
+    seat = seat_of(table, ctx.author) if table else None
+    if seat is None:
+        ctx.outbox.whisper("You're not in a BMB game here.")
+        return
+
+    # this says something about the card the other player can't see, so keep it private
+    if ctx.interaction:
+        ctx.outbox.whisper(odds_text(table, seat))
+    else:
+        ctx.outbox.dm(ctx.author, odds_text(table, seat))
+
+def odds_text(table, seat):
+    seen = CARD_NAME[table.cards[1 - seat]]
+    text = f"Against the {seen} you can see, you win {win_chance(table, seat):.0%} of showdowns."
+    to_call = table.bets[1 - seat] - table.bets[seat]
+    if to_call > 0:
+        text += f" Calling {to_call} into a pot of {table.pot} needs {to_call / (table.pot + to_call):.0%}."
+    return text
+
+
+# --- buttons ---
+class BMBView(discord.ui.View):
+    def __init__(self):
+        super().__init__(timeout=None)
+
+    @discord.ui.button(label="Call / check", style=discord.ButtonStyle.primary, custom_id="bmb:call")
+    async def call_button(self, interaction, button):
+        await component_move(interaction, "bmb", bmb_button_move, "call", bmb_call)
+
+    @discord.ui.button(label=f"Raise {BMB_ANTE}", style=discord.ButtonStyle.success, custom_id="bmb:raise")
+    async def raise_button(self, interaction, button):
+        await component_move(interaction, "bmb", bmb_button_move, "raise", bmb_raise, BMB_ANTE)
+
+    @discord.ui.button(label="Fold", style=discord.ButtonStyle.danger, custom_id="bmb:fold")
+    async def fold_button(self, interaction, button):
+        await component_move(interaction, "bmb", bmb_button_move, "fold", bmb_fold)
+
+    @discord.ui.button(label="Odds", style=discord.ButtonStyle.secondary, custom_id="bmb:odds")
+    async def odds_button(self, interaction, button):
+        _, table, seat = seated(interaction, "bmb")
+        text = "You're not in this BMB game." if seat is None else odds_text(table, seat)
+        await interaction.response.send_message(text, ephemeral=True)
+
+async def bmb_button_move(ctx, key, table, seat, op, action, *args):
+    bmb_move(ctx, key, table, seat, op, action, *args)
+
+def bmb_status(table):
+    p1, p2 = table.players
+    return (f"**Blind Man's Bluff** — pot {table.pot}, price to call {table.price}\n"
+            f"Chips: {p1.display_name} {table.chips[0]}, {p2.display_name} {table.chips[1]}\n"
+            f"{table.players[table.turn].mention} to act.")
+
+
+# --- turn timeout and extension setup ---
+async def auto_bmb(ctx, key, table, seat):
+    if not isinstance(table.players[seat], BotSeat):
+        events = bmb_fold(table, seat)
+        record_move(key, "bmb", table, "fold", seat)
+        announce_bmb(ctx, key, table, events)
+    run_bot_turns(ctx, key, table)
+
+async def setup(bot):
+    for command in (start_ip, bmb_raise_cmd, bmb_call_cmd, bmb_fold_cmd, odds):
+        bot.add_command(command)
+    AUTO_MOVES["bmb"] = auto_bmb
+    TABLE_STARTS["bmb"] = start_bmb_table
+    TABLE_SIZES["bmb"] = (2, 2, 2)
+    TABLE_STATUS["bmb"] = bmb_status
+    TABLE_VIEWS["bmb"] = BMBView()
+    bot.add_view(TABLE_VIEWS["bmb"])
+# ---------------------------------
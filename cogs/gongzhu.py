@@ -0,0 +1,281 @@
+import asyncio
+import os
+import typing
+from concurrent.futures import ProcessPoolExecutor
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+import gongzhu
+from cards import CARD_NAME, GONGZHU_DECK, IllegalMove, format_gongzhu_hand, hand_cards, parse_cards, render_cards
+from deal import DealPool
+from gongzhu import follow_suit, gongzhu_play, legal_cards, new_gongzhu_game, scoring_cards
+from gongzhu_solver import SOLVE_BUDGET, analysis_window, analyze_hand
+from replay import decode_header, gongzhu_deals
+from tables import (
+    AUTO_MOVES, HAND_VIEWS, TABLE_SIZES, TABLE_STARTS, TABLE_STATUS, BotSeat, arm_timer, end_table, gongzhu_tables,
+    record_move, record_results, seat_of, send_hand, spawn, store, table_key,
+)
+from ui import TABLE_VIEWS, post_status, seated, send_card_menu
+
+# --- Gongzhu Game Commands ---
+# A table plays a single hand unless it's started as a match:
+# `!startGongzhu 1000 @a @b @c` deals hands until someone's total reaches -1000.
+gongzhu_decks = DealPool(GONGZHU_DECK)
+
+@commands.command()
+async def startGongzhu(ctx, match: typing.Optional[int] = None, *mentions: discord.Member):
+    key = table_key(ctx)
+
+    if key in gongzhu_tables:
+        ctx.outbox.say("A Gongzhu game is already in progress.")
+        return
+
+    if not (3 <= len(mentions) <= 5):
+        ctx.outbox.say("Gongzhu must be played with 3-5 players.")
+        return
+    if match is not None and match <= 0:
+        ctx.outbox.say("Give a match as the total to play down to, e.g. `!startGongzhu 1000 @a @b @c`.")
+        return
+
+    await start_gongzhu_table(ctx, key, mentions, -match if match else None)
+
+async def start_gongzhu_table(ctx, key, players, limit=None):
+    # later hands of a match keep drawing from the same seeded stream
+    seed, rng, deck = gongzhu_decks.take()
+    if gongzhu_decks.claim_fill():
+        spawn(asyncio.to_thread(gongzhu_decks.fill))
+    table = new_gongzhu_game(players, rng, limit, deck)
+    gongzhu_tables[key] = table
+    store.record_deal(key, "gongzhu", seed, table)
+    store.snapshot(key, "gongzhu", table)
+    arm_timer("gongzhu", key)
+
+    for seat, p in enumerate(table.players):
+        send_hand(ctx, p, format_gongzhu_hand(table.hands[seat]))
+
+    length = f"playing until someone reaches {limit}" if limit is not None else "for one hand"
+    ctx.outbox.say(f"Gongzhu started with {len(table.players)} players, {length}"
+                   f" (deal seed {seed}). {table.players[0].mention} plays first.")
+    await ctx.outbox.flush()
+    await post_status(ctx, "gongzhu", key)
+    run_bot_turns(ctx, key, table)
+
+def announce_gongzhu(ctx, key, table, events):
+    for event in events:
+        kind = event[0]
+        if kind == gongzhu.PLAYED:
+            _, seat, card = event
+            player = table.players[seat]
+            selected = CARD_NAME[card]
+            ctx.outbox.say(f"{player.display_name} played: {selected}")
+            remaining_hand = format_gongzhu_hand(table.hands[seat])
+            if player.id == ctx.author.id:
+                ctx.outbox.whisper(f"You played: {selected}\nYour remaining hand:\n{remaining_hand}")
+            send_hand(ctx, player, remaining_hand)
+        elif kind == gongzhu.TURN:
+            ctx.outbox.say(f"{table.players[event[1]].mention}, it's your turn.")
+        elif kind == gongzhu.TRICK:
+            _, winner, cards_taken = event
+            ctx.outbox.say(f"{table.players[winner].display_name} wins the round and collects: {render_cards(cards_taken)}")
+        elif kind == gongzhu.NEW_TRICK:
+            ctx.outbox.say(f"Next round starts. {table.players[event[1]].mention} plays first.")
+        elif kind == gongzhu.HAND_OVER:
+            ctx.outbox.say(f"Hand {table.hands_played} over. Scores:")
+            for p_seat, p in enumerate(table.players):
+                taken = render_cards(scoring_cards(table, p_seat)) or "no scoring cards"
+                ctx.outbox.say(f"{p.display_name}: {event[1][p_seat]:+d} ({taken}), total {table.totals[p_seat]}")
+        elif kind == gongzhu.NEW_HAND:
+            for p_seat, p in enumerate(table.players):
+                send_hand(ctx, p, format_gongzhu_hand(table.hands[p_seat]))
+            ctx.outbox.say(f"New hand dealt. {table.players[event[1]].mention} plays first.")
+        elif kind == gongzhu.GAME_OVER:
+            best = max(range(len(table.players)), key=lambda s: table.totals[s])
+            record_results(key, "gongzhu", table, {s for s, t in enumerate(table.totals) if t == table.totals[best]},
+                           table.totals)
+            end_table("gongzhu", key)
+            ctx.outbox.say(f"Gongzhu game over. {table.players[best].display_name} wins with {table.totals[best]}.")
+
+def bot_card(table, seat):
+    # bot seats (and idle players) get rid of their lowest legal card
+    legal = legal_cards(table, seat)
+    return (legal & -legal).bit_length() - 1
+
+def run_bot_turns(ctx, key, table):
+    while gongzhu_tables.get(key) is table and isinstance(table.players[table.turn], BotSeat):
+        seat = table.turn
+        card = bot_card(table, seat)
+        events = gongzhu_play(table, seat, card)
+        record_move(key, "gongzhu", table, "play", seat, card)
+        announce_gongzhu(ctx, key, table, events)
+
+@commands.hybrid_command(name="pg", description="Play a card in Gongzhu game")
+@app_commands.describe(card="Card to play (e.g., 'A♦' or 'RJ' for Red Joker)")
+async def pg(ctx, *, card: str):
+    key = table_key(ctx)
+    table = gongzhu_tables.get(key)
+
+    if not table:
+        ctx.outbox.whisper("No active Gongzhu game.")
+        return
+
+    player = ctx.author
+    seat = seat_of(table, player)
+    if seat is None or seat != table.turn:
+        ctx.outbox.whisper("It's not your turn.")
+        return
+
+    parsed = parse_cards([card])
+    if parsed is None:
+        ctx.outbox.whisper("Invalid or unowned card.")
+        return
+
+    gongzhu_move(ctx, key, table, seat, parsed[0])
+
+def gongzhu_move(ctx, key, table, seat, card):
+    try:
+        events = gongzhu_play(table, seat, card)
+    except IllegalMove as e:
+        ctx.outbox.whisper(str(e))
+        return
+    record_move(key, "gongzhu", table, "play", seat, card)
+
+    announce_gongzhu(ctx, key, table, events)
+    run_bot_turns(ctx, key, table)
+
+# --- buttons ---
+class GongzhuView(discord.ui.View):
+    def __init__(self):
+        super().__init__(timeout=None)
+
+    @discord.ui.button(label="Play a card", style=discord.ButtonStyle.primary, custom_id="gongzhu:play")
+    async def play_button(self, interaction, button):
+        _, table, seat = seated(interaction, "gongzhu")
+        if seat is None:
+            await interaction.response.send_message("You're not in this Gongzhu game.", ephemeral=True)
+            return
+        # the menu only offers the cards that may be played; off turn it just shows the hand
+        cards = hand_cards(legal_cards(table, seat)) if seat == table.turn else []
+        await send_card_menu(interaction, "gongzhu", f"Your hand:\n{gongzhu_hand(table, seat)}", cards, play_chosen)
+
+async def play_chosen(ctx, key, table, seat, cards):
+    gongzhu_move(ctx, key, table, seat, cards[0])
+
+def gongzhu_status(table):
+    totals = ", ".join(f"{p.display_name} {table.totals[s]}" for s, p in enumerate(table.players))
+    lines = [f"**Gongzhu** hand {table.hands_played + 1} — totals: {totals}"]
+    if table.current_round:
+        lines.append("On the table: " + ", ".join(f"{CARD_NAME[card]} ({table.players[s].display_name})"
+                                                  for s, card in table.current_round))
+    lines.append(f"{table.players[table.turn].mention} to play.")
+    return "\n".join(lines)
+
+# --- post-game analysis ---
+# !analyze solves the last tricks of a finished hand double dummy for the
+# player who asks: where their cards lost points against the best play, and
+# the best line from there. Which tricks it covers depends on the table size
+# (see gongzhu_solver.analysis_window) and the replies always name them. The
+# solver runs in its own worker process under SOLVE_BUDGET.
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "1"))
+ANALYSIS_GRACE = 5.0  # on top of the budget, for starting the worker
+analysis_pool = None
+analysis_slots = asyncio.Semaphore(ANALYSIS_WORKERS)
+
+async def run_analysis(hands, plays, seat, all_hearts):
+    global analysis_pool
+    if analysis_pool is None:
+        analysis_pool = ProcessPoolExecutor(max_workers=ANALYSIS_WORKERS)
+
+    async with analysis_slots:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(analysis_pool, analyze_hand, hands, plays, seat, all_hearts)
+        return await asyncio.wait_for(future, SOLVE_BUDGET + ANALYSIS_GRACE)
+
+@commands.command(name="analyze")
+async def analyze(ctx, replay_id: int = None, hand: int = None):
+    guild = ctx.guild.id if ctx.guild else None
+    if replay_id is None:
+        latest = await asyncio.to_thread(store.find_replays, guild, ctx.channel.id, ctx.author.id, limit=1,
+                                         game="gongzhu")
+        if not latest:
+            ctx.outbox.say("You haven't played Gongzhu in this channel yet.")
+            return
+        replay_id = latest[0][0]
+    data = await asyncio.to_thread(store.load_replay, replay_id, guild)
+    if not data or decode_header(data)[0] != "gongzhu":
+        ctx.outbox.say(f"There is no Gongzhu replay #{replay_id} in this server.")
+        return
+
+    _, _, players, _, _ = decode_header(data)
+    names = [name for _, name in players]
+    seat = next((s for s, (player_id, _) in enumerate(players) if player_id == ctx.author.id), None)
+    if seat is None:
+        ctx.outbox.say(f"You didn't play in replay #{replay_id}.")
+        return
+    deals = list(gongzhu_deals(data))
+    hand = hand or len(deals)
+    if not 1 <= hand <= len(deals):
+        ctx.outbox.say(f"Replay #{replay_id} has {len(deals)} finished hand(s).")
+        return
+
+    hands, all_hearts, plays, scores = deals[hand - 1]
+    window, last = analysis_window(hands)
+    ctx.outbox.say(f"Analysing tricks {window}-{last} of hand {hand} of replay #{replay_id} for {names[seat]}"
+                   f" (the last {last - window + 1} tricks are as deep as the solver goes with"
+                   f" {len(hands)} players)...")
+    await ctx.outbox.flush()
+    try:
+        decisions, line = await run_analysis(hands, plays, seat, all_hearts)
+    except asyncio.TimeoutError:
+        ctx.outbox.say("The analysis didn't finish in time.")
+        return
+
+    ctx.outbox.say(f"{names[seat]} scored {scores[seat]:+d} in hand {hand}.")
+    if not decisions:
+        ctx.outbox.say("Not even the last trick could be solved in time.")
+        return
+    first = decisions[0][0]
+    if first > window:
+        ctx.outbox.say(f"Only tricks {first}-{last} could be solved in {SOLVE_BUDGET:.0f}s.")
+    if first > 1:
+        ctx.outbox.say(f"Tricks 1-{first - 1} were not analysed.")
+    for number, card, best, lost in decisions:
+        if lost:
+            ctx.outbox.say(f"Trick {number}: you played {CARD_NAME[card]}, {CARD_NAME[best]} was {lost} points better.")
+        else:
+            ctx.outbox.say(f"Trick {number}: {CARD_NAME[card]} was a best play.")
+    total = sum(lost for *_, lost in decisions)
+    ctx.outbox.say(f"Points lost from trick {first} on: {total}." if total else f"No points lost from trick {first} on.")
+    if line:
+        ctx.outbox.say("Best play with every hand face up:")
+        for number, trick, winner in line:
+            cards = ", ".join(f"{names[s]} {CARD_NAME[c]}" for s, c in trick)
+            ctx.outbox.say(f"Trick {number}: {cards} — {names[winner]} wins")
+# ----------------------------------
+
+# --- turn timeout and extension setup ---
+async def auto_gongzhu(ctx, key, table, seat):
+    if not isinstance(table.players[seat], BotSeat):
+        card = bot_card(table, seat)
+        events = gongzhu_play(table, seat, card)
+        record_move(key, "gongzhu", table, "play", seat, card)
+        announce_gongzhu(ctx, key, table, events)
+    run_bot_turns(ctx, key, table)
+
+def gongzhu_hand(table, seat):
+    # on your turn the cards you may play are in bold
+    follow = follow_suit(table, seat) if seat == table.turn else None
+    return format_gongzhu_hand(table.hands[seat], follow)
+
+async def setup(bot):
+    for command in (startGongzhu, pg, analyze):
+        bot.add_command(command)
+    AUTO_MOVES["gongzhu"] = auto_gongzhu
+    HAND_VIEWS["gongzhu"] = gongzhu_hand
+    TABLE_STARTS["gongzhu"] = start_gongzhu_table
+    TABLE_SIZES["gongzhu"] = (3, 5, 4)
+    TABLE_STATUS["gongzhu"] = gongzhu_status
+    TABLE_VIEWS["gongzhu"] = GongzhuView()
+    bot.add_view(TABLE_VIEWS["gongzhu"])
+# ----------------------------------
@@ -0,0 +1,229 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+import landlord
+from cards import DECK_SIZE, FULL_DECK, IllegalMove, format_landlord_hand, hand_cards, hand_mask, render_cards
+from deal import DealPool
+from landlord import describe, landlord_pass, landlord_play, new_landlord_game, parse_play
+from landlord_ai import choose_move, quick_move
+from tables import (
+    AUTO_MOVES, HAND_VIEWS, TABLE_SIZES, TABLE_STARTS, TABLE_STATUS, BotSeat, arm_timer, end_table, landlord_tables,
+    record_move, record_results, seat_of, send_hand, spawn, store, table_key,
+)
+from ui import TABLE_VIEWS, component_move, post_status, seated, send_card_menu
+
+# --- Landlord Game Commands ---
+MAX_BOT_SEATS = 2
+BOT_MOVE_TIMEOUT = 1.0  # hard cap on a bot turn, seconds
+AI_WORKERS = int(os.getenv("AI_WORKERS", "0")) or None  # default: one per core
+ai_pool = None
+landlord_decks = DealPool(range(DECK_SIZE))
+
+async def choose_bot_move(table, seat):
+    global ai_pool
+    if ai_pool is None:
+        ai_pool = ProcessPoolExecutor(max_workers=AI_WORKERS)
+
+    n = len(table.players)
+    hand = table.hands[seat]
+    last = table.last_play[2] if table.last_play else None
+    last_offset = (table.last_play[0] - seat) % n if table.last_play else 0
+    sizes = [table.hands[(seat + k) % n].bit_count() for k in range(1, n)]
+    unseen = FULL_DECK & ~hand & ~table.played
+
+    # the search runs in a worker process; if it misses the cap the seat plays the greedy move
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(ai_pool, choose_move, hand, last, last_offset, sizes, unseen)
+    try:
+        return await asyncio.wait_for(future, BOT_MOVE_TIMEOUT)
+    except asyncio.TimeoutError:
+        return quick_move(hand, last)
+
+def announce_landlord(ctx, key, table, events):
+    for event in events:
+        kind = event[0]
+        if kind == landlord.PLAYED:
+            _, seat, play, _ = event
+            player = table.players[seat]
+            played = render_cards(hand_cards(play))
+            hand_text = format_landlord_hand(table.hands[seat])
+            ctx.outbox.say(f"{player.display_name} played: {played}")
+            if player.id == ctx.author.id:
+                ctx.outbox.whisper(f"You played: {played}\nYour remaining hand:\n{hand_text}")
+            send_hand(ctx, player, hand_text)
+        elif kind == landlord.PASSED:
+            ctx.outbox.say(f"{table.players[event[1]].display_name} passed.")
+        elif kind == landlord.NEW_LEAD:
+            ctx.outbox.say("Everyone else passed. You may play anything.")
+        elif kind == landlord.TURN:
+            ctx.outbox.say(f"It's now {table.players[event[1]].mention}'s turn.")
+        elif kind == landlord.WON:
+            ctx.outbox.say(f"{table.players[event[1]].display_name} wins the Landlord game!")
+            record_results(key, "landlord", table, {event[1]})
+            end_table("landlord", key)
+
+def bot_still_to_move(key, table, seat):
+    return landlord_tables.get(key) is table and table.turn == seat
+
+async def run_bot_turns(ctx, key, table):
+    while landlord_tables.get(key) is table and isinstance(table.players[table.turn], BotSeat):
+        seat = table.turn
+        await ctx.outbox.flush()
+        if not bot_still_to_move(key, table, seat):
+            return
+        move = await choose_bot_move(table, seat)
+        # the table may have ended or been replaced while the search ran
+        if not bot_still_to_move(key, table, seat):
+            return
+        if move:
+            events = landlord_play(table, seat, move)
+            record_move(key, "landlord", table, "play", seat, move)
+        else:
+            events = landlord_pass(table, seat)
+            record_move(key, "landlord", table, "pass", seat)
+        announce_landlord(ctx, key, table, events)
+
+@commands.command()
+async def startLandlord(ctx, *mentions: discord.Member):
+    key = table_key(ctx)
+    if key in landlord_tables:
+        ctx.outbox.say("A Landlord game is already in progress.")
+        return
+    if len(mentions) < 3 - MAX_BOT_SEATS or len(mentions) > 5:
+        ctx.outbox.say(f"You must mention between {3 - MAX_BOT_SEATS} and 5 players;"
+                       " bots fill the empty seats up to 3.")
+        return
+
+    # bot seats fill the table up to the 3-player minimum
+    await start_landlord_table(ctx, key, list(mentions) + [BotSeat(i + 1) for i in range(3 - len(mentions))])
+
+async def start_landlord_table(ctx, key, players):
+    seed, rng, deck = landlord_decks.take()
+    if landlord_decks.claim_fill():
+        spawn(asyncio.to_thread(landlord_decks.fill))
+    table = new_landlord_game(players, rng, deck)
+    landlord_tables[key] = table
+    store.record_deal(key, "landlord", seed, table)
+    store.snapshot(key, "landlord", table)
+    arm_timer("landlord", key)
+
+    for seat, p in enumerate(table.players):
+        send_hand(ctx, p, format_landlord_hand(table.hands[seat]))
+
+    ctx.outbox.say(f"Landlord game started with {len(table.players)} players (deal seed {seed})."
+                   f" {table.players[0].mention}, it's your turn.")
+    await ctx.outbox.flush()
+    await post_status(ctx, "landlord", key)
+    await run_bot_turns(ctx, key, table)
+
+async def landlord_move(ctx, key, table, seat, play):
+    # play is a card mask; None passes
+    try:
+        if play is not None:
+            events = landlord_play(table, seat, play)
+            record_move(key, "landlord", table, "play", seat, play)
+        else:
+            events = landlord_pass(table, seat)
+            record_move(key, "landlord", table, "pass", seat)
+    except IllegalMove as e:
+        ctx.outbox.whisper(str(e))
+        return
+
+    announce_landlord(ctx, key, table, events)
+    await run_bot_turns(ctx, key, table)
+
+@commands.hybrid_command(name="pl", description="Play cards in Landlord game")
+@app_commands.describe(cards="Cards to play ('Ad = A♦, 2s = 2♠' or '3 3')")
+async def pl(ctx, *, cards: str):
+    key = table_key(ctx)
+    table = landlord_tables.get(key)
+
+    seat = seat_of(table, ctx.author) if table else None
+    if seat is None or seat != table.turn:
+        ctx.outbox.whisper("It's not your turn or no active Landlord game.")
+        return
+
+    try:
+        play = parse_play(table.hands[seat], cards.split())
+    except IllegalMove as e:
+        ctx.outbox.whisper(str(e))
+        return
+    await landlord_move(ctx, key, table, seat, play)
+
+@commands.command()
+async def xl(ctx):
+    key = table_key(ctx)
+    table = landlord_tables.get(key)
+
+    seat = seat_of(table, ctx.author) if table else None
+    if seat is None or seat != table.turn:
+        return
+    await landlord_move(ctx, key, table, seat, None)
+
+# --- buttons ---
+class LandlordView(discord.ui.View):
+    def __init__(self):
+        super().__init__(timeout=None)
+
+    @discord.ui.button(label="Play cards", style=discord.ButtonStyle.primary, custom_id="landlord:play")
+    async def play_button(self, interaction, button):
+        _, table, seat = seated(interaction, "landlord")
+        if seat is None:
+            await interaction.response.send_message("You're not in this Landlord game.", ephemeral=True)
+            return
+        cards = hand_cards(table.hands[seat])
+        await send_card_menu(interaction, "landlord", f"Your hand:\n{format_landlord_hand(table.hands[seat])}",
+                             cards, play_chosen, max_values=len(cards), placeholder="Choose the cards to play")
+
+    @discord.ui.button(label="Pass", style=discord.ButtonStyle.secondary, custom_id="landlord:pass")
+    async def pass_button(self, interaction, button):
+        await component_move(interaction, "landlord", pass_turn)
+
+async def play_chosen(ctx, key, table, seat, cards):
+    await landlord_move(ctx, key, table, seat, hand_mask(cards))
+
+async def pass_turn(ctx, key, table, seat):
+    await landlord_move(ctx, key, table, seat, None)
+
+def landlord_status(table):
+    counts = ", ".join(f"{p.display_name} {table.hands[s].bit_count()}" for s, p in enumerate(table.players))
+    lines = [f"**Landlord** — cards left: {counts}"]
+    if table.last_play:
+        seat, cards, combo = table.last_play
+        lines.append(f"To beat: {render_cards(hand_cards(cards))} ({describe(combo)}) by {table.players[seat].display_name}")
+    lines.append(f"{table.players[table.turn].mention} to play.")
+    return "\n".join(lines)
+
+# --- turn timeout and extension setup ---
+async def auto_landlord(ctx, key, table, seat):
+    # pass when allowed, otherwise lead the greedy move; bot seats just take their turns
+    if not isinstance(table.players[seat], BotSeat):
+        if table.last_play is not None:
+            events = landlord_pass(table, seat)
+            record_move(key, "landlord", table, "pass", seat)
+        else:
+            move = quick_move(table.hands[seat], None)
+            events = landlord_play(table, seat, move)
+            record_move(key, "landlord", table, "play", seat, move)
+        announce_landlord(ctx, key, table, events)
+    await run_bot_turns(ctx, key, table)
+
+def landlord_hand(table, seat):
+    return format_landlord_hand(table.hands[seat])
+
+async def setup(bot):
+    for command in (startLandlord, pl, xl):
+        bot.add_command(command)
+    AUTO_MOVES["landlord"] = auto_landlord
+    HAND_VIEWS["landlord"] = landlord_hand
+    TABLE_STARTS["landlord"] = start_landlord_table
+    TABLE_SIZES["landlord"] = (3, 5, 3)
+    TABLE_STATUS["landlord"] = landlord_status
+    TABLE_VIEWS["landlord"] = LandlordView()
+    bot.add_view(TABLE_VIEWS["landlord"])
+# -------------------------------------------
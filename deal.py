@@ -0,0 +1,77 @@
+import random
+import secrets
+
+# --- Deal service ---
+# Every table gets its own RNG stream, seeded from the OS CSPRNG. The seed is
+# written to the store's deal log when the table starts, so any deal (and, for
+# Gongzhu and BMB, every later hand or round drawn from the same stream) can
+# be reproduced for replays and disputes with random.Random(seed).
+#
+# Dealing is a partial Fisher-Yates shuffle: only as many positions as there
+# are cards to hand out are drawn, and nothing is ever removed from a list.
+# DealPool pre-generates seeded decks in bulk so a busy process doesn't shuffle
+# on the command path.
+
+SEED_BITS = 63  # fits the store's signed 64-bit args
+POOL_SIZE = 256
+
+
+def new_seed():
+    return secrets.randbits(SEED_BITS)
+
+
+def table_rng(seed):
+    return random.Random(seed)
+
+
+def shuffled(cards, rng, k=None):
+    # the first k cards of a uniform shuffle of `cards` (all of them by default)
+    deck = list(cards)
+    n = len(deck)
+    k = n if k is None else k
+    # scaling one 53-bit float per card: for a 54-card deck the deviation from
+    # uniform is below 2**-46, and it is noticeably faster than randrange
+    rand = rng.random
+    for i in range(min(k, n - 1)):
+        j = i + int(rand() * (n - i))
+        deck[i], deck[j] = deck[j], deck[i]
+    del deck[k:]
+    return deck
+
+
+class DealPool:
+    # hands out (seed, rng, deck): `deck` is the first shuffle drawn from
+    # `rng`, which is random.Random(seed) and can keep dealing later hands.
+    # Seeding a stream costs more than the shuffle itself, so a pool that runs
+    # low is topped up in bulk away from the command (see claim_fill).
+    def __init__(self, cards, size=POOL_SIZE):
+        self.cards = list(cards)
+        self.size = size
+        self.ready = []
+        self.filling = False
+
+    def _make(self):
+        seed = new_seed()
+        rng = table_rng(seed)
+        return seed, rng, shuffled(self.cards, rng)
+
+    def take(self):
+        if self.ready:
+            return self.ready.pop()
+        return self._make()
+
+    def claim_fill(self):
+        # True for exactly one caller once the pool is below half full; that
+        # caller is expected to run fill(), typically in a worker thread
+        if self.filling or len(self.ready) >= self.size // 2:
+            return False
+        self.filling = True
+        return True
+
+    def fill(self):
+        try:
+            while len(self.ready) < self.size:
+                self.ready.append(self._make())
+        finally:
+            self.filling = False
+# ----------------------------------
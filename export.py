@@ -0,0 +1,144 @@
+import argparse
+import calendar
+import os
+import sqlite3
+import sys
+import time
+
+from cards import hand_cards
+from replay import AMOUNT, ARG_KIND, CARD, CARD_MASK, decode_header, decode_moves
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# --- Replay export ---
+# Converts the replay archive into two Parquet files for analytics:
+#   replays.parquet  one row per table: id, guild, channel, game, seed,
+#                    started, ended, player ids
+#   moves.parquet    one row per move: replay id, move number, seat, op,
+#                    cards (list of card ids), amount
+# Replays are read with a cursor and written one row group per --batch
+# replays, so memory stays flat however big the archive is. Needs pyarrow.
+#
+#   python export.py out/ --db games.db --game gongzhu --since 2026-10-01
+
+BATCH = 5000
+
+REPLAY_SCHEMA = None if pa is None else pa.schema([
+    ("replay", pa.int64()),
+    ("guild", pa.int64()),
+    ("channel", pa.int64()),
+    ("game", pa.string()),
+    ("seed", pa.int64()),
+    ("started", pa.timestamp("ms", tz="UTC")),
+    ("ended", pa.timestamp("ms", tz="UTC")),
+    ("players", pa.list_(pa.int64())),
+])
+
+MOVE_SCHEMA = None if pa is None else pa.schema([
+    ("replay", pa.int64()),
+    ("move", pa.int32()),
+    ("seat", pa.int8()),
+    ("op", pa.string()),
+    ("cards", pa.list_(pa.uint8())),
+    ("amount", pa.int64()),
+])
+
+
+def columns(schema):
+    return {name: [] for name in schema.names}
+
+
+def add_replay(replays, moves, row):
+    replay_id, guild, channel, game, seed, started, ended, data = row
+    _, _, players, _, pos = decode_header(data)
+    replays["replay"].append(replay_id)
+    replays["guild"].append(guild)
+    replays["channel"].append(channel)
+    replays["game"].append(game)
+    replays["seed"].append(seed)
+    replays["started"].append(int(started * 1000))
+    replays["ended"].append(None if ended is None else int(ended * 1000))
+    replays["players"].append([player_id for player_id, _ in players])
+
+    for number, (op, args) in enumerate(decode_moves(data, game, pos)):
+        kind = ARG_KIND.get((game, op))
+        moves["replay"].append(replay_id)
+        moves["move"].append(number)
+        moves["seat"].append(args[0])
+        moves["op"].append(op)
+        if kind == CARD_MASK:
+            moves["cards"].append(hand_cards(args[1]))
+        elif kind == CARD:
+            moves["cards"].append([args[1]])
+        else:
+            moves["cards"].append([])
+        moves["amount"].append(args[1] if kind == AMOUNT else None)
+
+
+def export(db, out_dir, game=None, since=None, until=None, batch=BATCH):
+    sql = "SELECT id, guild, channel, game, seed, started, ended, data FROM replays"
+    where, params = [], []
+    if game:
+        where.append("game = ?")
+        params.append(game)
+    if since is not None:
+        where.append("started >= ?")
+        params.append(since)
+    if until is not None:
+        where.append("started < ?")
+        params.append(until)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id"
+
+    os.makedirs(out_dir, exist_ok=True)
+    conn = sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+    replay_writer = pq.ParquetWriter(os.path.join(out_dir, "replays.parquet"), REPLAY_SCHEMA)
+    move_writer = pq.ParquetWriter(os.path.join(out_dir, "moves.parquet"), MOVE_SCHEMA)
+    total = 0
+    try:
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch)
+            if not rows:
+                break
+            replays, moves = columns(REPLAY_SCHEMA), columns(MOVE_SCHEMA)
+            for row in rows:
+                add_replay(replays, moves, row)
+            replay_writer.write_table(pa.Table.from_pydict(replays, schema=REPLAY_SCHEMA))
+            move_writer.write_table(pa.Table.from_pydict(moves, schema=MOVE_SCHEMA))
+            total += len(rows)
+    finally:
+        replay_writer.close()
+        move_writer.close()
+        conn.close()
+    return total
+
+
+def parse_day(day):
+    return calendar.timegm(time.strptime(day, "%Y-%m-%d")) if day else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the replay archive to Parquet")
+    parser.add_argument("out", help="directory for replays.parquet and moves.parquet")
+    parser.add_argument("--db", default=os.getenv("GAME_DB", "games.db"))
+    parser.add_argument("--game", choices=("landlord", "gongzhu", "bmb"))
+    parser.add_argument("--since", help="first day to include, YYYY-MM-DD (UTC)")
+    parser.add_argument("--until", help="first day to leave out, YYYY-MM-DD (UTC)")
+    parser.add_argument("--batch", type=int, default=BATCH, help="replays per row group")
+    args = parser.parse_args()
+    if pa is None:
+        sys.exit("export.py needs pyarrow (pip install pyarrow)")
+
+    started = time.perf_counter()
+    total = export(args.db, args.out, args.game, parse_day(args.since), parse_day(args.until), args.batch)
+    print(f"exported {total} replay(s) to {args.out} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import random
+
+from cards import (
+    CARD_RANK, CARD_SUIT, CARD_VALUE, DECK_SIZE, GONGZHU_DECK, HEARTS, PIG, SHEEP, SUIT_MASK, TRANSFORMER,
+    IllegalMove, hand_cards, hand_mask, ranks, suits,
+)
+from deal import shuffled
+
+# --- Gongzhu rules ---
+# Seats are indexes into `players`; the rules never look at the player
+# objects themselves.
+
+PLAYED = "played"
+TURN = "turn"
+TRICK = "trick"
+NEW_TRICK = "new_trick"
+HAND_OVER = "hand_over"
+NEW_HAND = "new_hand"
+GAME_OVER = "game_over"
+
+# --- Scoring ---
+# Hearts 5-10 are -10 each, J -20, Q -30, K -40, A -50 (4♥ is worth nothing).
+# The pig (Q♠) is -100 and the sheep (J♦) +100. The transformer (10♣) doubles
+# everything else its taker scored, or is worth +50 taken on its own. Taking
+# every heart that was dealt turns the hearts positive.
+#
+# Each seat keeps the running sum of its card points plus a mask of the
+# scoring cards it took, so a trick updates the winner's score in O(1) and the
+# end of a hand never looks at the collected piles.
+HEART_POINTS = {'5': -10, '6': -10, '7': -10, '8': -10, '9': -10, '10': -10, 'J': -20, 'Q': -30, 'K': -40, 'A': -50}
+CARD_POINTS = [HEART_POINTS.get(ranks[CARD_RANK[c]], 0) if CARD_SUIT[c] == HEARTS else 0 for c in range(DECK_SIZE)]
+CARD_POINTS[PIG] = -100
+CARD_POINTS[SHEEP] = 100
+TRANSFORMER_ALONE = 50
+SCORING_MASK = (hand_mask(GONGZHU_DECK) & SUIT_MASK[HEARTS]) | 1 << PIG | 1 << SHEEP | 1 << TRANSFORMER
+
+# A match ends after the hand in which someone's total reaches this.
+MATCH_LIMIT = -1000
+
+
+class GongzhuState:
+    def __init__(self, players, rng, limit=None, deck=None):
+        self.players = players
+        self.rng = rng
+        self.limit = limit  # None plays a single hand
+        self.totals = [0] * len(players)
+        self.hands_played = 0
+        self.finished = False
+        deal_gongzhu_hand(self, deck)
+
+
+def deal_gongzhu_hand(state, deck=None):
+    # only the cards that get dealt are drawn from the table's rng
+    n = len(state.players)
+    per_player = len(GONGZHU_DECK) // n
+    if deck is None:
+        deck = shuffled(GONGZHU_DECK, state.rng, n * per_player)
+    state.hands = [hand_mask(deck[i * per_player:(i + 1) * per_player]) for i in range(n)]
+    # with 3 or 5 players a few cards stay undealt; only dealt hearts count
+    dealt = 0
+    for hand in state.hands:
+        dealt |= hand
+    state.all_hearts = dealt & SUIT_MASK[HEARTS]
+
+    # suit_counts[seat][suit] is kept up to date as cards are played, so the
+    # follow-suit check never looks at the hand itself
+    state.suit_counts = [[(hand & mask).bit_count() for mask in SUIT_MASK] for hand in state.hands]
+
+    state.start_player = state.hands_played % n
+    state.turn = state.start_player
+    state.current_round = []  # (seat, card) in play order
+    state.leading_suit = None
+    state.collected_cards = [[] for _ in range(n)]
+    state.points = [0] * n
+    state.taken = [0] * n
+    state.scores = [0] * n
+
+
+def new_gongzhu_game(players, rng=None, limit=None, deck=None):
+    # the state keeps its own rng for later hands, so it can be snapshotted;
+    # `deck` is an already shuffled first deck drawn from that rng
+    return GongzhuState(list(players), rng or random.Random(), limit, deck)
+
+
+def hand_score(state, seat):
+    taken = state.taken[seat]
+    score = state.points[seat]
+    if state.all_hearts and taken & state.all_hearts == state.all_hearts:
+        score -= 2 * sum(CARD_POINTS[c] for c in hand_cards(state.all_hearts))
+    if taken >> TRANSFORMER & 1:
+        score = TRANSFORMER_ALONE if taken == 1 << TRANSFORMER else score * 2
+    return score
+
+
+def follow_suit(state, seat):
+    # the suit `seat` has to play, or None when any card will do
+    suit = state.leading_suit
+    if suit is not None and state.suit_counts[seat][suit]:
+        return suit
+    return None
+
+
+def legal_cards(state, seat):
+    suit = follow_suit(state, seat)
+    if suit is None:
+        return state.hands[seat]
+    return state.hands[seat] & SUIT_MASK[suit]
+
+
+def trick_winner(plays, leading_suit):
+    valid_plays = [(seat, c) for seat, c in plays if CARD_SUIT[c] == leading_suit]
+    return max(valid_plays, key=lambda x: CARD_VALUE[x[1]])[0]
+
+
+def gongzhu_play(state, seat, card):
+    if state.finished or seat != state.turn:
+        raise IllegalMove("It's not your turn.")
+    if not state.hands[seat] >> card & 1:
+        raise IllegalMove("Invalid or unowned card.")
+    suit = follow_suit(state, seat)
+    if suit is not None and CARD_SUIT[card] != suit:
+        raise IllegalMove(f"You must follow suit ({suits[suit]}).")
+
+    state.hands[seat] &= ~(1 << card)
+    state.suit_counts[seat][CARD_SUIT[card]] -= 1
+    events = [(PLAYED, seat, card)]
+
+    state.current_round.append((seat, card))
+    if len(state.current_round) == 1:
+        state.leading_suit = CARD_SUIT[card]
+
+    state.turn = (seat + 1) % len(state.players)
+
+    if len(state.current_round) < len(state.players):
+        events.append((TURN, state.turn))
+        return events
+
+    winner = trick_winner(state.current_round, state.leading_suit)
+    cards_taken = [c for _, c in state.current_round]
+    state.collected_cards[winner].extend(cards_taken)
+    taken = points = 0
+    for c in cards_taken:
+        taken |= 1 << c
+        points += CARD_POINTS[c]
+    state.taken[winner] |= taken & SCORING_MASK
+    state.points[winner] += points
+    state.scores[winner] = hand_score(state, winner)
+    events.append((TRICK, winner, cards_taken))
+
+    # Reset round
+    state.current_round = []
+    state.leading_suit = None
+    state.turn = winner
+
+    if any(state.hands):
+        events.append((NEW_TRICK, winner))
+        return events
+    return _finish_hand(state, events)
+
+
+def _finish_hand(state, events):
+    scores = list(state.scores)
+    state.hands_played += 1
+    for s, score in enumerate(scores):
+        state.totals[s] += score
+    events.append((HAND_OVER, scores))
+
+    if state.limit is None or min(state.totals) <= state.limit:
+        state.finished = True
+        events.append((GAME_OVER,))
+        return events
+    deal_gongzhu_hand(state)
+    events.append((NEW_HAND, state.turn))
+    return events
+
+
+def scoring_cards(state, seat):
+    return hand_cards(state.taken[seat])
+# ----------------------------------
@@ -0,0 +1,366 @@
+import time
+from collections import OrderedDict
+
+from cards import CARD_SUIT, HEARTS, PIG, SHEEP, SUIT_MASK, TRANSFORMER
+from gongzhu import CARD_POINTS, SCORING_MASK, TRANSFORMER_ALONE, trick_winner
+
+# --- Gongzhu double-dummy solver ---
+# Finds the best play for one seat of a Gongzhu hand with every hand face up.
+# Gongzhu is not a two-sided game, so the search is "paranoid": the seat
+# maximises its own score for the hand and every other seat plays to
+# minimise it. That makes it a plain minimax over cards, searched with
+# alpha-beta on null windows (MTD(f)):
+#   * only the seat's own score is tracked, as the mask of scoring cards it
+#     took so far, and scored with the hand rules once the cards run out;
+#   * at the start of a trick, the lowest and highest score the seat can
+#     still end with cut the search off when they fall outside the window
+#     (or meet, e.g. once no scoring card is left in anyone's hand);
+#   * cards of one suit in one hand that no live card sits between, and that
+#     score the same, are equivalent; only the lowest of each run is tried;
+#   * moves are ordered with the best card stored for the position first;
+#     after that the seat ducks under the trick (or wins it high) and
+#     everyone void in the suit led gets rid of their worst cards;
+#   * positions at the start of a trick go into a bounded LRU transposition
+#     table with a lower and an upper bound on their value.
+#
+# Card ids go up with rank inside a suit (the Gongzhu deck has no 2s or 3s),
+# so the trick goes to the highest id of the suit led.
+#
+# Exact search in pure Python only reaches the end of a hand, so the analysis
+# covers a fixed number of final tricks per table size (ANALYSIS_TRICKS),
+# sized so nearly every deal solves in a second or two. analyze_hand() works
+# backwards from the last trick: each position it solves leaves its subtrees
+# in the transposition table for the one before. SOLVE_BUDGET is a hard cap;
+# if it runs out first the result says how far back it got. Everything is
+# plain ints, so it can run in a worker process.
+
+SOLVE_BUDGET = 5.0  # seconds for one hand
+ANALYSIS_TRICKS = {3: 8, 4: 6, 5: 5}  # final tricks analysed, by number of players
+LINE_SHARE = 0.25  # of the budget kept for the best line
+TT_SIZE = 200000
+DEADLINE_CHECK = 4096  # nodes between clock reads
+INF = 10 ** 6
+
+
+class SolverTimeout(Exception):
+    pass
+
+
+def hand_value(taken, all_hearts):
+    # the hand score of a seat that took the scoring cards in `taken`; same
+    # rules as gongzhu.hand_score
+    score = 0
+    for c in _bits(taken):
+        score += CARD_POINTS[c]
+    if all_hearts and taken & all_hearts == all_hearts:
+        for c in _bits(all_hearts):
+            score -= 2 * CARD_POINTS[c]
+    if taken >> TRANSFORMER & 1:
+        score = TRANSFORMER_ALONE if taken == 1 << TRANSFORMER else score * 2
+    return score
+
+
+def _live(hands, trick):
+    live = 0
+    for hand in hands:
+        live |= hand
+    for _, c in trick:
+        live |= 1 << c
+    return live
+
+
+def _bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class Solver:
+    # Positions are (hands, turn, trick, taken): every seat's hand mask, the
+    # seat to play, the current trick as [(seat, card)] and the scoring cards
+    # the analysed seat took so far. Values are that seat's final score.
+    def __init__(self, seat, all_hearts, deadline=None, tt_size=TT_SIZE):
+        self.seat = seat
+        self.all_hearts = all_hearts
+        self.deadline = deadline
+        self.tt = OrderedDict()  # (hands, leader, taken) -> (lower, upper, best card)
+        self.tt_size = tt_size
+        self.values = {}  # taken mask -> hand_value
+        self.ranges = {}  # (taken, scoring cards still in play) -> (lowest, highest) final score
+        self.nodes = 0
+
+    def value(self, hands, turn, trick, taken, guess=0):
+        hands, trick = list(hands), list(trick)
+        live = _live(hands, trick)
+        return self._mtd(lambda alpha, beta: self._search(hands, turn, trick, taken, live, alpha, beta), guess)
+
+    def card_value(self, hands, turn, trick, taken, card, guess=0):
+        # the value once `turn` has played `card`
+        hands, trick = list(hands), list(trick)
+        live = _live(hands, trick)
+        return self._mtd(lambda alpha, beta: self._after(hands, turn, trick, taken, live, card, alpha, beta), guess)
+
+    def moves(self, hands, turn, trick):
+        # the cards worth trying here, one per group of equivalent cards
+        return [card for card, _ in self._moves(hands, turn, trick, _live(hands, trick), None)]
+
+    def best_card(self, hands, turn, trick, taken):
+        # (value, card) of the best card for `turn`; a card after the first is
+        # only searched in full once a null window shows it's better
+        hands, trick = list(hands), list(trick)
+        live = _live(hands, trick)
+        maximising = turn == self.seat
+        best = card = None
+        for candidate, _ in self._moves(hands, turn, trick, live, None):
+            if best is None:
+                better = True
+            elif maximising:
+                better = self._after(hands, turn, trick, taken, live, candidate, best, best + 1) > best
+            else:
+                better = self._after(hands, turn, trick, taken, live, candidate, best - 1, best) < best
+            if better:
+                best = self.card_value(hands, turn, trick, taken, candidate, best or 0)
+                card = candidate
+        return best, card
+
+    def _mtd(self, search, guess):
+        lower, upper = -INF, INF
+        while lower < upper:
+            beta = guess + 1 if guess == lower else guess
+            guess = search(beta - 1, beta)
+            if guess < beta:
+                upper = guess
+            else:
+                lower = guess
+        return guess
+
+    def _score(self, taken):
+        value = self.values.get(taken)
+        if value is None:
+            value = self.values[taken] = hand_value(taken, self.all_hearts)
+        return value
+
+    def _range(self, taken, rest):
+        # lowest and highest score the seat can still end with, taking any
+        # part of `rest` on top of `taken`. The score only goes up with the
+        # hearts once the pig, sheep and transformer are decided, so the ends
+        # are at no more hearts, all of them, or all but the cheapest (which
+        # keeps the hearts from turning positive).
+        key = (taken, rest)
+        found = self.ranges.get(key)
+        if found is not None:
+            return found
+        hearts = rest & SUIT_MASK[HEARTS]
+        heart_sets = {0, hearts}
+        if hearts:
+            heart_sets.add(hearts & ~(1 << min(_bits(hearts), key=lambda c: abs(CARD_POINTS[c]))))
+        specials = [0]
+        for card in (PIG, SHEEP, TRANSFORMER):
+            if rest >> card & 1:
+                specials += [mask | 1 << card for mask in specials]
+        scores = [self._score(taken | h | x) for h in heart_sets for x in specials]
+        found = self.ranges[key] = (min(scores), max(scores))
+        return found
+
+    def _search(self, hands, turn, trick, taken, live, alpha, beta):
+        # `live` is every card still in a hand or on the table, which stays the
+        # same through a trick
+        self.nodes += 1
+        if self.deadline is not None and not self.nodes % DEADLINE_CHECK and time.perf_counter() > self.deadline:
+            raise SolverTimeout()
+
+        key = None
+        best_first = None
+        if not trick:
+            lowest, highest = self._range(taken, live & SCORING_MASK)
+            if lowest >= beta or lowest == highest:
+                return lowest
+            if highest <= alpha:
+                return highest
+            key = (tuple(hands), turn, taken)
+            entry = self.tt.get(key)
+            if entry is not None:
+                self.tt.move_to_end(key)
+                lower, upper, best_first = entry
+                if lower >= beta:
+                    return lower
+                if upper <= alpha:
+                    return upper
+                alpha = max(alpha, lower)
+                beta = min(beta, upper)
+        start_alpha, start_beta = alpha, beta
+
+        maximising = turn == self.seat
+        best = -INF if maximising else INF
+        best_card = None
+        for card, _ in self._moves(hands, turn, trick, live, best_first):
+            value = self._after(hands, turn, trick, taken, live, card, alpha, beta)
+            if maximising:
+                if value > best:
+                    best, best_card = value, card
+                    alpha = max(alpha, value)
+            elif value < best:
+                best, best_card = value, card
+                beta = min(beta, value)
+            if alpha >= beta:
+                break
+
+        if key is not None:
+            lower, upper = -INF, INF
+            if best <= start_alpha:
+                upper = best
+            elif best >= start_beta:
+                lower = best
+            else:
+                lower = upper = best
+            self.tt[key] = (lower, upper, best_card)
+            if len(self.tt) > self.tt_size:
+                self.tt.popitem(last=False)
+        return best
+
+    def _after(self, hands, turn, trick, taken, live, card, alpha, beta):
+        # plays `card` for `turn`, searches on, and takes the card back
+        hands[turn] ^= 1 << card
+        trick.append((turn, card))
+        if len(trick) < len(hands):
+            value = self._search(hands, (turn + 1) % len(hands), trick, taken, live, alpha, beta)
+        else:
+            suit = CARD_SUIT[trick[0][1]]
+            winner, top = trick[0]
+            pile = 0
+            for s, c in trick:
+                pile |= 1 << c
+                if CARD_SUIT[c] == suit and c > top:
+                    winner, top = s, c
+            if winner == self.seat:
+                taken |= pile & SCORING_MASK
+            value = self._search(hands, winner, [], taken, live & ~pile, alpha, beta)
+        trick.pop()
+        hands[turn] ^= 1 << card
+        return value
+
+    def _moves(self, hands, turn, trick, live, best_first):
+        # (card, equivalent cards) to try, in search order
+        hand = hands[turn]
+        follow = hand & SUIT_MASK[CARD_SUIT[trick[0][1]]] if trick else 0
+        legal = follow or hand
+
+        # suit equivalence: runs of same-scoring cards with no live card between them
+        groups = []
+        for suit_mask in SUIT_MASK:
+            if not legal & suit_mask:
+                continue
+            run = None
+            cards = live & suit_mask
+            while cards:
+                low = cards & -cards
+                cards ^= low
+                c = low.bit_length() - 1
+                if not legal & low:
+                    run = None
+                elif run is not None and TRANSFORMER not in (c, run[0]) and CARD_POINTS[c] == CARD_POINTS[run[0]]:
+                    run[1].append(c)
+                else:
+                    run = [c, []]
+                    groups.append(run)
+
+        if trick and not follow:
+            groups.sort(key=lambda g: (CARD_POINTS[g[0]], -g[0]))  # void: get rid of the worst cards first
+        elif trick and turn == self.seat:
+            # the seat ducks with its highest card that loses the trick, or wins it high
+            top = max(c for _, c in trick if CARD_SUIT[c] == CARD_SUIT[trick[0][1]])
+            groups.sort(key=lambda g: (g[0] > top, -g[0]))
+        else:
+            groups.sort(key=lambda g: g[0])  # otherwise low cards first
+        if best_first is not None:
+            for i, group in enumerate(groups):
+                if group[0] == best_first or best_first in group[1]:
+                    groups.insert(0, groups.pop(i))
+                    break
+        return groups
+
+
+# --- Hand analysis ---
+def analysis_window(hands):
+    # (first, last) trick number analyze_hand() covers for these hands as dealt
+    last = hands[0].bit_count()
+    return max(1, last - ANALYSIS_TRICKS[len(hands)] + 1), last
+
+
+def analyze_hand(hands, plays, seat, all_hearts, budget=SOLVE_BUDGET):
+    # hands: every seat's hand as dealt, plays: the hand's [(seat, card)] in
+    # order. Returns (decisions, line):
+    #   decisions  (trick number, card played, best card, points lost) for
+    #              the seat's plays in analysis_window(), as far back as was
+    #              solved in time
+    #   line       everyone's best cards from the earliest solved decision to
+    #              the end of the hand, as (trick number, [(seat, card)],
+    #              winner) per trick
+    # the best line gets the last LINE_SHARE of the budget
+    started = time.perf_counter()
+    solver = Solver(seat, all_hearts, started + budget * (1 - LINE_SHARE))
+    first, _ = analysis_window(hands)
+    positions = [p for p in _positions(hands, plays, seat) if p[0] >= first]
+    decisions = []
+    start = None
+    try:
+        for number, position, card in reversed(positions):
+            if len(solver.moves(*position[:3])) == 1:
+                decisions.append((number, card, card, 0))  # forced, or every choice is the same
+                continue
+            best, best_card = solver.best_card(*position)
+            played = best if card == best_card else solver.card_value(*position, card, best)
+            decisions.append((number, card, best_card if played < best else card, best - played))
+            start = number, position
+    except SolverTimeout:
+        pass
+    decisions.reverse()
+
+    line = []
+    solver.deadline = started + budget
+    if start is not None:
+        try:
+            line = best_line(solver, *start)
+        except SolverTimeout:
+            pass
+    return decisions, line
+
+
+def _positions(hands, plays, seat):
+    # yields (trick number, position, card played) before each of the seat's plays
+    hands = list(hands)
+    trick = []
+    taken = 0
+    for number, (turn, card) in enumerate(plays):
+        if turn == seat:
+            yield number // len(hands) + 1, (tuple(hands), turn, tuple(trick), taken), card
+        hands[turn] &= ~(1 << card)
+        trick.append((turn, card))
+        if len(trick) == len(hands):
+            if trick_winner(trick, CARD_SUIT[trick[0][1]]) == seat:
+                for _, c in trick:
+                    taken |= 1 << c & SCORING_MASK
+            trick = []
+
+
+def best_line(solver, number, position):
+    # everyone's best cards from this position on, trick by trick
+    hands, turn, trick, taken = position
+    hands, trick = list(hands), list(trick)
+    line = []
+    while any(hands):
+        _, card = solver.best_card(hands, turn, trick, taken)
+        hands[turn] &= ~(1 << card)
+        trick.append((turn, card))
+        turn = (turn + 1) % len(hands)
+        if len(trick) == len(hands):
+            turn = trick_winner(trick, CARD_SUIT[trick[0][1]])
+            if turn == solver.seat:
+                for _, c in trick:
+                    taken |= 1 << c & SCORING_MASK
+            line.append((number, trick, turn))
+            number += 1
+            trick = []
+    return line
+# ----------------------------------
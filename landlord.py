@@ -0,0 +1,334 @@
+import random
+from collections import Counter, namedtuple
+from itertools import combinations
+
+from cards import (
+    CARD_NAME, DECK_SIZE, RANK_INDEX, RANK_MASK, IllegalMove,
+    hand_cards, hand_mask, parse_cards, render_cards, take_rank,
+)
+from deal import shuffled
+
+# --- Landlord combinations ---
+# Plays are classified from a rank histogram (15 ranks: 3..2, Black Joker,
+# Red Joker), so classification and comparison cost the same whatever the
+# hand size. `rank` is the highest rank of the defining part of the play
+# (the run for straights/airplanes, the triple for triple+kicker) and
+# `length` is the number of rank groups in that part.
+
+SINGLE = "single"
+PAIR = "pair"
+TRIPLE = "triple"
+TRIPLE_SINGLE = "triple with single"
+TRIPLE_PAIR = "triple with pair"
+STRAIGHT = "straight"
+PAIR_STRAIGHT = "consecutive pairs"
+AIRPLANE = "airplane"
+AIRPLANE_SINGLES = "airplane with singles"
+AIRPLANE_PAIRS = "airplane with pairs"
+BOMB = "bomb"
+ROCKET = "rocket"
+
+Combo = namedtuple("Combo", "kind rank length")
+
+NUM_RANKS = 15
+BLACK_JOKER_RANK = 13
+RED_JOKER_RANK = 14
+HIGHEST_RUN_RANK = 11  # runs stop at A; 2 and the jokers can't be part of one
+
+MIN_RUN_LENGTH = {STRAIGHT: 5, PAIR_STRAIGHT: 3, AIRPLANE: 2, AIRPLANE_SINGLES: 2, AIRPLANE_PAIRS: 2}
+
+NIBBLE_COUNT = [bin(n).count("1") for n in range(16)]
+
+
+def rank_histogram(mask):
+    counts = [NIBBLE_COUNT[(mask >> (r * 4)) & 0xF] for r in range(13)]
+    counts.append(mask >> 52 & 1)
+    counts.append(mask >> 53 & 1)
+    return counts
+
+
+def _is_run(run_ranks):
+    return run_ranks[-1] <= HIGHEST_RUN_RANK and run_ranks[-1] - run_ranks[0] == len(run_ranks) - 1
+
+
+def _classify_airplane(counts, total):
+    triples = [r for r in range(HIGHEST_RUN_RANK + 1) if counts[r] >= 3]
+    for k in range(len(triples), 1, -1):
+        for i in range(len(triples) - k + 1):
+            run = triples[i:i + k]
+            if not _is_run(run):
+                continue
+            rest = total - 3 * k
+            if rest == 0:
+                return Combo(AIRPLANE, run[-1], k)
+            # kickers are one single or pair from each of k different ranks outside the run
+            width = 1 if rest == k else 2 if rest == 2 * k else 0
+            if width and _kickers_fit(counts, run, width):
+                return Combo(AIRPLANE_SINGLES if width == 1 else AIRPLANE_PAIRS, run[-1], k)
+    return None
+
+
+def _kickers_fit(counts, run, width):
+    if any(counts[r] != 3 for r in run):
+        return False
+    if width == 2 and (counts[BLACK_JOKER_RANK] or counts[RED_JOKER_RANK]):
+        return False
+    return all(counts[r] in (0, width) for r in range(NUM_RANKS) if r not in run)
+
+
+def classify(mask):
+    # Combo for a set of cards, or None if it isn't a legal combination
+    counts = rank_histogram(mask)
+    total = sum(counts)
+    if total == 0:
+        return None
+    used = [r for r in range(NUM_RANKS) if counts[r]]
+
+    if total == 2 and counts[BLACK_JOKER_RANK] and counts[RED_JOKER_RANK]:
+        return Combo(ROCKET, RED_JOKER_RANK, 1)
+    if len(used) == 1:
+        r = used[0]
+        return Combo((SINGLE, PAIR, TRIPLE, BOMB)[total - 1], r, 1)
+
+    shape = sorted(counts[r] for r in used)
+    if shape == [1, 3]:
+        return Combo(TRIPLE_SINGLE, next(r for r in used if counts[r] == 3), 1)
+    if shape == [2, 3]:
+        return Combo(TRIPLE_PAIR, next(r for r in used if counts[r] == 3), 1)
+    if total >= 5 and all(c == 1 for c in shape) and _is_run(used):
+        return Combo(STRAIGHT, used[-1], len(used))
+    if len(used) >= 3 and all(c == 2 for c in shape) and _is_run(used):
+        return Combo(PAIR_STRAIGHT, used[-1], len(used))
+    if total >= 6:
+        return _classify_airplane(counts, total)
+    return None
+
+
+def beats(play, last):
+    if play.kind == ROCKET:
+        return True
+    if last.kind == ROCKET:
+        return False
+    if play.kind == BOMB:
+        return last.kind != BOMB or play.rank > last.rank
+    return play.kind == last.kind and play.length == last.length and play.rank > last.rank
+
+
+def describe(combo):
+    if combo.kind in MIN_RUN_LENGTH:
+        return f"{combo.kind} of {combo.length}"
+    return combo.kind
+# ----------------------------------
+
+
+
+
+# --- Legal move generation ---
+
+def _take(mask, rank, n):
+    if rank >= BLACK_JOKER_RANK:
+        card = mask & RANK_MASK[rank]
+        return card if n == 1 else 0
+    return take_rank(mask, rank, n)
+
+
+def _groups(hand, counts, n, above, top=RED_JOKER_RANK):
+    return [(r, _take(hand, r, n)) for r in range(above + 1, top + 1) if counts[r] >= n]
+
+
+def _runs(hand, counts, width, length, above):
+    # every run of `length` ranks holding at least `width` cards each, ending above `above`
+    moves = []
+    for high in range(max(above + 1, length - 1), HIGHEST_RUN_RANK + 1):
+        low = high - length + 1
+        if all(counts[r] >= width for r in range(low, high + 1)):
+            mask = 0
+            for r in range(low, high + 1):
+                mask |= take_rank(hand, r, width)
+            moves.append((high, mask))
+    return moves
+
+
+def _run_lengths(counts, width, kind):
+    # every run length that could be formed from this histogram
+    longest = best = 0
+    for r in range(HIGHEST_RUN_RANK + 1):
+        best = best + 1 if counts[r] >= width else 0
+        longest = max(longest, best)
+    return range(MIN_RUN_LENGTH[kind], longest + 1)
+
+
+def _with_kickers(hand, counts, base_ranks, base, k, width):
+    # `base` plus k kicker groups of `width` cards, each from a different other rank
+    candidates = [r for r in range(NUM_RANKS) if r not in base_ranks and counts[r] >= width
+                  and (width == 1 or r < BLACK_JOKER_RANK)]
+    return [base | _or_all(_take(hand, r, width) for r in chosen) for chosen in combinations(candidates, k)]
+
+
+def _or_all(masks):
+    mask = 0
+    for m in masks:
+        mask |= m
+    return mask
+
+
+def _moves_of_kind(hand, counts, kind, length, above):
+    moves = []
+    if kind == SINGLE:
+        moves += [m for _, m in _groups(hand, counts, 1, above)]
+    elif kind == PAIR:
+        moves += [m for _, m in _groups(hand, counts, 2, above, 12)]
+    elif kind in (TRIPLE, TRIPLE_SINGLE, TRIPLE_PAIR):
+        for r, base in _groups(hand, counts, 3, above, 12):
+            if kind == TRIPLE:
+                moves.append(base)
+            else:
+                moves += _with_kickers(hand, counts, (r,), base, 1, 1 if kind == TRIPLE_SINGLE else 2)
+    elif kind == BOMB:
+        moves += [m for _, m in _groups(hand, counts, 4, above, 12)]
+    elif kind == ROCKET:
+        if counts[BLACK_JOKER_RANK] and counts[RED_JOKER_RANK]:
+            moves.append(RANK_MASK[BLACK_JOKER_RANK] | RANK_MASK[RED_JOKER_RANK])
+    elif kind == STRAIGHT:
+        moves += [m for _, m in _runs(hand, counts, 1, length, above)]
+    elif kind == PAIR_STRAIGHT:
+        moves += [m for _, m in _runs(hand, counts, 2, length, above)]
+    else:
+        for high, base in _runs(hand, counts, 3, length, above):
+            if kind == AIRPLANE:
+                moves.append(base)
+            else:
+                run = range(high - length + 1, high + 1)
+                moves += _with_kickers(hand, counts, run, base, length, 1 if kind == AIRPLANE_SINGLES else 2)
+    return moves
+
+
+def legal_moves(hand, last=None):
+    # Every play from `hand` that may follow `last` (any combination when
+    # leading). Each move is a card mask; suits are the lowest available.
+    counts = rank_histogram(hand)
+    if last is None:
+        moves = []
+        for kind in (SINGLE, PAIR, TRIPLE, TRIPLE_SINGLE, TRIPLE_PAIR, BOMB, ROCKET):
+            moves += _moves_of_kind(hand, counts, kind, 1, -1)
+        for kind, width in ((STRAIGHT, 1), (PAIR_STRAIGHT, 2), (AIRPLANE, 3),
+                            (AIRPLANE_SINGLES, 3), (AIRPLANE_PAIRS, 3)):
+            for length in _run_lengths(counts, width, kind):
+                moves += _moves_of_kind(hand, counts, kind, length, -1)
+        return moves
+
+    if last.kind == ROCKET:
+        return []
+    moves = _moves_of_kind(hand, counts, last.kind, last.length, last.rank)
+    if last.kind != BOMB:
+        moves += _moves_of_kind(hand, counts, BOMB, 1, -1)
+    moves += _moves_of_kind(hand, counts, ROCKET, 1, -1)
+    return moves
+# ----------------------------------
+
+
+
+
+# --- Game state ---
+# Seats are indexes into `players`; the rules never look at the player
+# objects themselves.
+
+PLAYED = "played"
+PASSED = "passed"
+NEW_LEAD = "new_lead"
+TURN = "turn"
+WON = "won"
+
+
+class LandlordState:
+    def __init__(self, players, hands, extra_cards=0):
+        self.players = players
+        self.hands = hands
+        self.turn = 0
+        self.last_play = None  # (seat, cards, combo)
+        self.passed = set()
+        self.played = 0
+        self.extra_cards = extra_cards
+        self.winner = None
+
+
+def new_landlord_game(players, rng=random, deck=None):
+    # `deck` is an already shuffled deck, e.g. one from a DealPool
+    if deck is None:
+        deck = shuffled(range(DECK_SIZE), rng)
+    n = len(players)
+    cards_per = len(deck) // n
+    hands = [hand_mask(deck[i * cards_per:(i + 1) * cards_per]) for i in range(n)]
+    return LandlordState(list(players), hands, hand_mask(deck[cards_per * n:]))
+
+
+def parse_play(hand, card_list):
+    # card mask for a !pl argument list, either ranks ("3 3") or cards ("3d 3h")
+    if all(card in RANK_INDEX for card in card_list):
+        play = 0
+        for rank, count in Counter(card_list).items():
+            chosen = take_rank(hand, RANK_INDEX[rank], count)
+            if not chosen:
+                raise IllegalMove(f"You don't have enough {rank}s to play.")
+            play |= chosen
+        return play
+
+    parsed = parse_cards(card_list)
+    if parsed is None:
+        raise IllegalMove("Invalid card format.")
+    play = hand_mask(parsed)
+    if play.bit_count() != len(parsed):
+        raise IllegalMove("You can't play the same card twice.")
+    return play
+
+
+def landlord_play(state, seat, play):
+    if state.winner is not None or seat != state.turn:
+        raise IllegalMove("It's not your turn.")
+    hand = state.hands[seat]
+    missing = play & ~hand
+    if missing:
+        raise IllegalMove(f"You don't have {CARD_NAME[hand_cards(missing)[0]]} in your hand.")
+    combo = classify(play)
+    if combo is None:
+        raise IllegalMove("That isn't a valid Landlord combination.")
+    if state.last_play and not beats(combo, state.last_play[2]):
+        _, last_cards, last_combo = state.last_play
+        raise IllegalMove(f"Your {describe(combo)} doesn't beat {render_cards(hand_cards(last_cards))} ({describe(last_combo)}).")
+
+    state.hands[seat] = hand & ~play
+    state.played |= play
+    state.last_play = (seat, play, combo)
+    state.passed = set()
+    events = [(PLAYED, seat, play, combo)]
+
+    if not state.hands[seat]:
+        state.winner = seat
+        events.append((WON, seat))
+        return events
+
+    state.turn = (seat + 1) % len(state.players)
+    events.append((TURN, state.turn))
+    return events
+
+
+def landlord_pass(state, seat):
+    if state.winner is not None or seat != state.turn:
+        raise IllegalMove("It's not your turn.")
+    if state.last_play is None:
+        raise IllegalMove("You're leading, so you have to play something.")
+
+    state.passed.add(seat)
+    events = [(PASSED, seat)]
+
+    # Check if all but last player have passed
+    if len(state.passed) == len(state.players) - 1:
+        state.turn = state.last_play[0]
+        state.last_play = None
+        state.passed = set()
+        events.append((NEW_LEAD, state.turn))
+    else:
+        state.turn = (seat + 1) % len(state.players)
+    events.append((TURN, state.turn))
+    return events
+# ----------------------------------
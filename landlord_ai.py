@@ -0,0 +1,123 @@
+import random
+import time
+from collections import OrderedDict
+
+from cards import hand_cards
+from landlord import BOMB, ROCKET, classify, legal_moves
+
+# --- Landlord AI ---
+# Bot seats pick moves with a determinized Monte Carlo search: the unseen
+# cards are dealt out to the opponents at random, every candidate move is
+# played out to the end with a fast greedy policy, and the move that wins
+# most often is chosen. The search stops at a time budget. Results are kept
+# in a bounded transposition table keyed by everything the seat can see, so
+# a position that comes up again is answered without searching.
+#
+# choose_move() is a plain function of plain ints so it can run in a worker
+# process; the bot wraps it with a hard timeout and falls back to
+# quick_move() if the worker doesn't answer in time.
+
+SEARCH_BUDGET = 0.5  # seconds of search per move
+EXPLORE = 0.2  # chance a rollout plays a random legal move instead of the greedy one
+TT_SIZE = 4096
+
+_transpositions = OrderedDict()
+
+
+def _lowest_card(mask):
+    return (mask & -mask).bit_length()
+
+
+def _policy_move(hand, last, rng=None):
+    moves = legal_moves(hand, last)
+    if not moves:
+        return 0
+    if rng is not None and rng.random() < EXPLORE:
+        return rng.choice(moves + [0]) if last is not None else rng.choice(moves)
+    if last is None:
+        # lead the lowest rank, shedding as many cards with it as possible
+        return min(moves, key=lambda m: (_lowest_card(m), -m.bit_count()))
+    plain = [m for m in moves if classify(m).kind not in (BOMB, ROCKET)]
+    if plain:
+        return min(plain, key=_lowest_card)
+    # only bomb when it goes out or the hand is nearly done
+    if hand.bit_count() <= 6:
+        return min(moves, key=_lowest_card)
+    return 0
+
+
+def quick_move(hand, last, rng=None):
+    # the rollout policy on its own; pass an rng to mix in random moves
+    return _policy_move(hand, last, rng)
+
+
+def _playout(seats, turn, last, last_seat, rng):
+    # play the table out with the rollout policy and return the winning seat
+    n = len(seats)
+    while True:
+        if last_seat == turn:
+            last = None
+        move = _policy_move(seats[turn], last, rng)
+        if move:
+            seats[turn] &= ~move
+            if not seats[turn]:
+                return turn
+            last = classify(move)
+            last_seat = turn
+        turn = (turn + 1) % n
+
+
+def _determinize(hand, sizes, unseen, rng):
+    pool = hand_cards(unseen)
+    rng.shuffle(pool)
+    seats = [hand]
+    start = 0
+    for size in sizes:
+        mask = 0
+        for c in pool[start:start + size]:
+            mask |= 1 << c
+        seats.append(mask)
+        start += size
+    return seats
+
+
+def choose_move(hand, last, last_offset, sizes, unseen, budget=SEARCH_BUDGET, seed=None):
+    # hand: this seat's mask. last: Combo to beat, or None when leading.
+    # last_offset: seats after this one that made `last`. sizes: hand sizes of
+    # the other seats in turn order. unseen: every card this seat can't see.
+    # Returns the chosen move mask, 0 to pass.
+    candidates = legal_moves(hand, last)
+    if last is not None:
+        candidates.append(0)
+    for move in candidates:
+        if move == hand:
+            return move
+    if len(candidates) <= 1:
+        return candidates[0] if candidates else 0
+
+    key = (hand, last, last_offset, tuple(sizes), unseen)
+    if key in _transpositions:
+        _transpositions.move_to_end(key)
+        return _transpositions[key]
+
+    rng = random.Random(seed)
+    wins = [0] * len(candidates)
+    tries = [0] * len(candidates)
+    deadline = time.perf_counter() + budget
+    while time.perf_counter() < deadline:
+        for i, move in enumerate(candidates):
+            seats = _determinize(hand, sizes, unseen, rng)
+            if move:
+                seats[0] &= ~move
+                winner = _playout(seats, 1 % len(seats), classify(move), 0, rng)
+            else:
+                winner = _playout(seats, 1 % len(seats), last, last_offset % len(seats), rng)
+            wins[i] += winner == 0
+            tries[i] += 1
+
+    best = max(range(len(candidates)), key=lambda i: (wins[i] / tries[i] if tries[i] else 0, -i))
+    _transpositions[key] = candidates[best]
+    if len(_transpositions) > TT_SIZE:
+        _transpositions.popitem(last=False)
+    return candidates[best]
+# ----------------------------------
@@ -0,0 +1,62 @@
+import argparse
+import os
+import signal
+import subprocess
+import sys
+
+# --- Shard launcher ---
+# Runs the bot as several processes so table work spreads over every core.
+# Each process gets its own slice of the gateway shards (SHARD_COUNT /
+# SHARD_IDS, see bot.py) and owns the tables of the guilds on those shards.
+# All processes share one game store, so changing --processes or --shards
+# and restarting hands every table to whichever process now owns its guild.
+#
+#   python launcher.py --shards 8 --processes 4
+#
+# Ctrl-C or SIGTERM stops every process cleanly, letting each one flush its
+# store queue before it exits.
+
+BOT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot.py")
+
+
+def shard_groups(shards, processes):
+    # round-robin, so no process gets more than one shard more than another
+    return [list(range(i, shards, processes)) for i in range(processes)]
+
+
+def child_env(shards, ids, index, ai_workers):
+    env = dict(os.environ, SHARD_COUNT=str(shards), SHARD_IDS=",".join(map(str, ids)), AI_WORKERS=str(ai_workers))
+    if env.get("METRICS_FILE"):
+        env["METRICS_FILE"] = f"{env['METRICS_FILE']}.{index}"
+    return env
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Run the bot as one process per group of shards")
+    parser.add_argument("--shards", type=int, default=cores, help="total gateway shards (default: one per core)")
+    parser.add_argument("--processes", type=int, default=None, help="bot processes (default: min(shards, cores))")
+    args = parser.parse_args()
+
+    processes = min(args.processes or min(args.shards, cores), args.shards)
+    ai_workers = max(1, cores // processes)
+    children = []
+    for index, ids in enumerate(shard_groups(args.shards, processes)):
+        print(f"process {index}: shards {ids}")
+        children.append(subprocess.Popen([sys.executable, BOT_FILE], env=child_env(args.shards, ids, index, ai_workers)))
+
+    def stop(signum, frame):
+        for child in children:
+            if child.poll() is None:
+                child.send_signal(signal.SIGINT)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    status = 0
+    for child in children:
+        status = child.wait() or status
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+import argparse
+import asyncio
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import discord
+
+from bench import FakeChannel, FakeGuild, calibration, input_text, measure
+from bmb import BMB_ANTE, CALL, CHECK, RAISE, legal_actions
+from cards import CARD_NAME, hand_cards
+from gongzhu import legal_cards
+from landlord_ai import quick_move
+from outbox import RateLimiter
+
+# --- Load test ---
+# Runs the bot from bot.py with its game extensions under synthetic traffic,
+# with no Discord involved:
+#   * FakeGateway stands in for the gateway. It turns each synthetic command
+#     into a message and hands it to the bot's own process_commands, so every
+#     command goes through argument conversion, checks and the before/after
+#     invoke hooks in bot.py, as a typed one does.
+#   * FakeRest stands in for the REST API. Every send waits --rest-latency
+#     and is counted.
+#   * Every table gets a driver that plays all of its seats as simulated
+#     users, with a random think time between turns. A finished game is
+#     followed straight away by a new one.
+# Latency is measured from dispatch until the command's messages are sent,
+# and includes waiting for the event loop. Memory per table is measured with
+# tracemalloc while all tables start, before the timed run.
+#
+# --ci runs a fixed CI_TABLES tables with CI_THINK seconds between turns,
+# well below what one core can serve, against the budgets in CI_BUDGETS. The
+# p99 budget is set for a host that runs bench.py's calibration loop at
+# CI_REFERENCE_SPEED; on a slower host it is scaled up by how much slower
+# that loop runs. The loop uses none of the bot's code, so a slower bot
+# still fails the gate.
+#
+#   python loadtest.py --tables 1000 --duration 30
+#   python loadtest.py --ci                 # short run, fails over budget
+#   python loadtest.py --max-p99 25 --max-table-kb 48
+#
+# Needs discord.py, like the cogs it loads.
+
+GAMES = ("landlord", "gongzhu", "bmb")
+PLAYERS = {"landlord": 3, "gongzhu": 4, "bmb": 2}
+START_COMMANDS = {"landlord": "startLandlord", "gongzhu": "startGongzhu", "bmb": "startBMB"}
+FIRST_MEMBER_ID = 10 ** 17  # Discord ids are 15-20 digits, or mentions don't convert
+CI_BUDGETS = {"p99_ms": 12.0, "table_kb": 64.0}
+CI_TABLES = 150
+CI_THINK = 0.5
+CI_DURATION = 10.0
+CI_REFERENCE_SPEED = 8000.0  # bench.calibration() runs per second on the host the budgets were set on
+
+
+class FakeRest:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.messages = 0
+        self.bytes = 0
+
+    async def send(self, destination, content, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.messages += 1
+        self.bytes += len(content)
+        return True
+
+
+class GatewayGuild:
+    # the guild every simulated table is in; the Member converters of the
+    # start commands look the mentioned players up here
+    id = FakeGuild.id
+
+    def __init__(self):
+        self.members = {}
+
+    def get_member(self, member_id):
+        return self.members.get(member_id)
+
+
+class GatewayMessage:
+    # what command invocation reads of a discord.Message
+    def __init__(self, state, content, author, channel, guild):
+        self._state = state
+        self.content = content
+        self.author = author
+        self.channel = channel
+        self.guild = guild
+        self.mentions = []
+        self.attachments = []
+
+
+class FakeGateway:
+    def __init__(self, bot):
+        self.bot = bot
+        self.state = bot._connection
+        self.guild = GatewayGuild()
+        self.member_ids = iter(range(FIRST_MEMBER_ID, 2 * FIRST_MEMBER_ID))
+        self.latencies = {}
+        self.errors = 0
+        # what READY would fill in; the prefix handling skips the bot's own messages
+        self.state.user = discord.ClientUser(state=self.state, data=self.user_data(next(self.member_ids), "bot"))
+        bot.add_listener(self.on_command_error)
+
+    def user_data(self, user_id, name):
+        return {"id": str(user_id), "username": name, "discriminator": "0", "avatar": None, "global_name": name}
+
+    def member(self):
+        member_id = next(self.member_ids)
+        data = {"user": self.user_data(member_id, f"Player {member_id - FIRST_MEMBER_ID}"),
+                "roles": [], "joined_at": None, "deaf": False, "mute": False, "flags": 0}
+        member = self.guild.members[member_id] = discord.Member(data=data, guild=self.guild, state=self.state)
+        return member
+
+    async def on_command_error(self, ctx, error):
+        self.errors += 1
+        if self.errors == 1:
+            print(f"first command error (!{ctx.invoked_with}): {error!r}", file=sys.stderr)
+
+    async def dispatch(self, author, channel, name, *args):
+        # types `!name args` into the channel; members are mentioned
+        words = [f"!{name}"] + [a.mention if isinstance(a, discord.Member) else str(a) for a in args]
+        message = GatewayMessage(self.state, " ".join(words), author, channel, self.guild)
+        started = time.perf_counter()
+        await self.bot.process_commands(message)
+        self.latencies.setdefault(name, []).append(time.perf_counter() - started)
+
+
+# --- simulated players ---
+def landlord_turn(table, seat, rng):
+    last = table.last_play[2] if table.last_play else None
+    move = quick_move(table.hands[seat], last, rng)
+    if move:
+        return "pl", (input_text(move),)
+    return "xl", ()
+
+
+def gongzhu_turn(table, seat, rng):
+    card = rng.choice(hand_cards(legal_cards(table, seat)))
+    return "pg", (CARD_NAME[card],)
+
+
+def bmb_turn(table, seat, rng):
+    action = rng.choice(legal_actions(table, seat))
+    if action == RAISE:
+        return "raise", (BMB_ANTE,)
+    if action in (CALL, CHECK):
+        return "call", ()
+    return "fold", ()
+
+
+TURNS = {"landlord": landlord_turn, "gongzhu": gongzhu_turn, "bmb": bmb_turn}
+
+
+class TableDriver:
+    def __init__(self, gateway, registry, game, channel, users, rng, think):
+        self.gateway = gateway
+        self.registry = registry
+        self.game = game
+        self.channel = channel
+        self.users = users
+        self.rng = rng
+        self.think = think
+        self.key = (FakeGuild.id, channel.id)
+        self.games = 0
+
+    async def start(self):
+        await self.gateway.dispatch(self.users[0], self.channel, START_COMMANDS[self.game], *self.users)
+        self.games += 1
+
+    async def run(self, deadline):
+        while time.perf_counter() < deadline:
+            table = self.registry.get(self.key)
+            if table is None:
+                await self.start()
+                continue
+            if self.think:
+                await asyncio.sleep(self.rng.expovariate(1 / self.think))
+            seat = table.turn
+            name, args = TURNS[self.game](table, seat, self.rng)
+            await self.gateway.dispatch(self.users[seat], self.channel, name, *args)
+
+
+# --- report ---
+def percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def latency_rows(latencies):
+    everything = sorted(v for values in latencies.values() for v in values)
+    rows = [(f"!{name}", sorted(values)) for name, values in sorted(latencies.items())]
+    rows.append(("all", everything))
+    return rows
+
+
+def format_latencies(latencies):
+    lines = [f"{'latency':<16} {'count':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}"]
+    for name, values in latency_rows(latencies):
+        if values:
+            cells = "".join(f" {percentile(values, q) * 1000:>7.2f}ms" for q in (0.5, 0.9, 0.99))
+            lines.append(f"{name:<16} {len(values):>9,}{cells} {values[-1] * 1000:>7.2f}ms")
+    return "\n".join(lines)
+
+
+DEAL_POOLS = {"landlord": "landlord_decks", "gongzhu": "gongzhu_decks"}
+
+
+async def load_test(args):
+    import tables
+    import ui
+    from bot import bot
+
+    if args.discord_limits:
+        limiter = RateLimiter()
+    else:
+        limiter = RateLimiter(rate=10 ** 9, per=1.0, global_rate=10 ** 9)
+    rest = FakeRest(args.rest_latency)
+    # everything the bot sends goes through ui.pipeline; point it at the fake REST API
+    ui.pipeline.transport = rest
+    ui.pipeline.limiter = limiter
+    gateway = FakeGateway(bot)
+    games = [g for g in args.games.split(",") if g]
+    for game in games:
+        await bot.load_extension(f"cogs.{game}")
+        # the deal pools refill in bulk; fill them up front so they aren't counted per table
+        if game in DEAL_POOLS:
+            getattr(bot.extensions[f"cogs.{game}"], DEAL_POOLS[game]).fill()
+
+    rng = random.Random(args.seed)
+    drivers = []
+    for i in range(args.tables):
+        game = games[i % len(games)]
+        users = [gateway.member() for _ in range(PLAYERS[game])]
+        drivers.append(TableDriver(gateway, tables.registries[game], game, FakeChannel(i + 1), users,
+                                   random.Random(rng.random()), args.think))
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    await asyncio.gather(*(driver.start() for driver in drivers))
+    while not tables.store.queue.empty():
+        await asyncio.sleep(0.01)
+    gc.collect()
+    table_bytes = (tracemalloc.get_traced_memory()[0] - before) / args.tables
+    tracemalloc.stop()
+    gateway.latencies.clear()
+    rest.messages = rest.bytes = 0
+
+    started = time.perf_counter()
+    await asyncio.gather(*(driver.run(started + args.duration) for driver in drivers))
+    elapsed = time.perf_counter() - started
+    tables.store.close()
+
+    commands = sum(len(v) for v in gateway.latencies.values())
+    users = sum(len(d.users) for d in drivers)
+    per_game = ", ".join(f"{g} {sum(d.game == g for d in drivers)}" for g in games)
+    print(f"{args.tables} tables ({per_game}), {users:,} simulated users, {elapsed:.1f}s")
+    print(f"memory per table: {table_bytes / 1024:.1f} KB")
+    print(f"commands: {commands:,} ({commands / elapsed:,.0f}/s), games started: {sum(d.games for d in drivers):,}")
+    print(f"messages out: {rest.messages:,} ({rest.messages / elapsed:,.0f}/s, {rest.bytes / max(commands, 1):.0f} bytes"
+          f" per command)")
+    print(format_latencies(gateway.latencies))
+
+    if gateway.errors:
+        print(f"command errors: {gateway.errors:,}")
+
+    everything = latency_rows(gateway.latencies)[-1][1]
+    p99_ms = percentile(everything, 0.99) * 1000 if everything else 0.0
+    return p99_ms, table_bytes / 1024, gateway.errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the game commands against a fake Discord")
+    parser.add_argument("--tables", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of traffic after every table started")
+    parser.add_argument("--games", default=",".join(GAMES), help="comma separated, tables are spread evenly")
+    parser.add_argument("--think", type=float, default=0.05, help="mean seconds a simulated user waits per turn")
+    parser.add_argument("--rest-latency", type=float, default=0.0, help="seconds every REST send takes")
+    parser.add_argument("--discord-limits", action="store_true", help="pace sends with Discord's rate limits")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-p99", type=float, help="fail when p99 latency is over this many ms")
+    parser.add_argument("--max-table-kb", type=float, help="fail when memory per table is over this many KB")
+    parser.add_argument("--ci", action="store_true",
+                        help=f"short run ({CI_TABLES} tables, {CI_DURATION:.0f}s) with the default budgets")
+    args = parser.parse_args()
+    if args.ci:
+        args.tables = CI_TABLES
+        args.duration = CI_DURATION
+        args.think = CI_THINK
+        args.max_table_kb = args.max_table_kb or CI_BUDGETS["table_kb"]
+        if args.max_p99 is None:
+            # never tightened on a faster host, only loosened on a slower one
+            speed = measure(calibration) / CI_REFERENCE_SPEED
+            args.max_p99 = CI_BUDGETS["p99_ms"] * max(1.0, 1 / speed)
+            print(f"host speed: {speed:.2f}x the reference, p99 budget {args.max_p99:.2f}ms")
+
+    # a throwaway store, and no turn timeouts firing during the run
+    os.environ.setdefault("GAME_DB", os.path.join(tempfile.mkdtemp(), "loadtest.db"))
+    os.environ.setdefault("TURN_TIMEOUT", "0")
+    p99_ms, table_kb, errors = asyncio.run(load_test(args))
+
+    failures = []
+    if errors:
+        failures.append(f"{errors:,} command(s) failed")
+    if args.max_p99 is not None and p99_ms > args.max_p99:
+        failures.append(f"p99 latency {p99_ms:.2f}ms is over the {args.max_p99:.2f}ms budget")
+    if args.max_table_kb is not None and table_kb > args.max_table_kb:
+        failures.append(f"memory per table {table_kb:.1f} KB is over the {args.max_table_kb:g} KB budget")
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import heapq
+import itertools
+
+# --- Matchmaking ---
+# Players waiting for a table are kept in one heap per (guild, game, table
+# size, skill band), ordered by when they joined. The heap behaves as a
+# FIFO queue in which enqueueing and popping are O(log n):
+#   * join() pushes the player. Once the queue holds a full table, it pops
+#     that table straight away.
+#   * leave() only marks the entry as cancelled, in O(1). Cancelled entries
+#     are dropped whenever they reach the top of a heap.
+#   * expired() looks only at each queue's oldest player. When that player
+#     has waited long enough, it forms a table from what is waiting in that
+#     queue's size, taking the oldest players across all skill bands. The
+#     caller fills the empty seats with bots.
+# An entry is [joined, seq, player, channel, queue key]; seq keeps the order
+# total, so the heap never compares players.
+
+
+class Matchmaker:
+    def __init__(self):
+        self.queues = {}  # (guild, game, size, band) -> heap of entries
+        self.waiting = {}  # same key -> live entries in that heap
+        self.entries = {}  # (guild, player id) -> entry
+        self.seq = itertools.count()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def queued(self, guild, player_id):
+        entry = self.entries.get((guild, player_id))
+        return entry and entry[4]
+
+    def join(self, guild, game, size, band, player, channel, now):
+        # returns a full table's entries when this player completes one
+        key = (guild, game, size, band)
+        entry = [now, next(self.seq), player, channel, key]
+        heapq.heappush(self.queues.setdefault(key, []), entry)
+        self.entries[(guild, player.id)] = entry
+        self.waiting[key] = self.waiting.get(key, 0) + 1
+        if self.waiting[key] >= size:
+            return [self._pop(key) for _ in range(size)]
+        return None
+
+    def leave(self, guild, player_id):
+        entry = self.entries.pop((guild, player_id), None)
+        if entry is None:
+            return False
+        entry[2] = None
+        self.waiting[entry[4]] -= 1
+        return True
+
+    def requeue(self, entries):
+        # put back a table that couldn't start, keeping everyone's place
+        for entry in entries:
+            if entry[2] is not None:
+                heapq.heappush(self.queues[entry[4]], entry)
+                self.entries[(entry[4][0], entry[2].id)] = entry
+                self.waiting[entry[4]] += 1
+
+    def _head(self, key):
+        heap = self.queues[key]
+        while heap and heap[0][2] is None:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def _pop(self, key):
+        self._head(key)
+        entry = heapq.heappop(self.queues[key])
+        del self.entries[(key[0], entry[2].id)]
+        self.waiting[key] -= 1
+        return entry
+
+    def expired(self, now, wait):
+        # yields (guild, game, size, entries) for tables to start short-handed
+        for key in list(self.queues):
+            head = self._head(key)
+            if head is None or now - head[0] < wait:
+                continue
+            guild, game, size, _ = key
+            bands = [k for k in self.queues if k[:3] == key[:3]]
+            group = []
+            while len(group) < size:
+                heads = [(h, k) for k in bands for h in (self._head(k),) if h is not None]
+                if not heads:
+                    break
+                group.append(self._pop(min(heads)[1]))
+            yield guild, game, size, group
+# ----------------------------------
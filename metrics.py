@@ -0,0 +1,139 @@
+import asyncio
+import json
+import os
+import time
+from bisect import bisect_left
+
+# --- Instrumentation ---
+# Fixed log-scale histograms: observe() is a bisect and two increments, so
+# recording on every command costs next to nothing. Percentiles are read off
+# the bucket bounds.
+#
+# Per command we keep two histograms: "rules" (everything the command does
+# before and between sends: parsing, rule evaluation, bot search) and "io"
+# (time spent inside outbox flushes, i.e. waiting on Discord). On top of that
+# the loop-lag monitor measures how late a timer fires, and gauges report
+# things like the number of active tables.
+
+BUCKETS = [0.00005 * 2 ** i for i in range(22)]  # 50µs .. ~105s
+
+METRICS_FILE = os.getenv("METRICS_FILE")
+DUMP_INTERVAL = 60.0
+LAG_INTERVAL = 0.5
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self.commands = {}
+        self.timings = {}
+        self.loop_lag = Histogram()
+        self.gauges = {}
+        self.tasks = []
+
+    def record_command(self, name, total, io):
+        hists = self.commands.get(name)
+        if hists is None:
+            hists = self.commands[name] = {"rules": Histogram(), "io": Histogram()}
+        hists["rules"].observe(max(total - io, 0.0))
+        hists["io"].observe(io)
+
+    def observe(self, name, value):
+        hist = self.timings.get(name)
+        if hist is None:
+            hist = self.timings[name] = Histogram()
+        hist.observe(value)
+
+    def snapshot(self):
+        return {
+            "uptime": time.time() - self.started,
+            "commands": {name: {part: h.summary() for part, h in hists.items()}
+                         for name, hists in self.commands.items()},
+            "timings": {name: h.summary() for name, h in self.timings.items()},
+            "loop_lag": self.loop_lag.summary(),
+            "gauges": {name: gauge() for name, gauge in self.gauges.items()},
+        }
+
+    # --- background tasks ---
+    def start(self, dump_path=METRICS_FILE, dump_interval=DUMP_INTERVAL):
+        self.tasks.append(asyncio.create_task(self._watch_loop_lag()))
+        if dump_path:
+            self.tasks.append(asyncio.create_task(self._dump_periodically(dump_path, dump_interval)))
+
+    async def _watch_loop_lag(self):
+        while True:
+            scheduled = time.perf_counter() + LAG_INTERVAL
+            await asyncio.sleep(LAG_INTERVAL)
+            self.loop_lag.observe(max(time.perf_counter() - scheduled, 0.0))
+
+    async def _dump_periodically(self, path, interval):
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(write_json, path, self.snapshot())
+
+
+def write_json(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp, path)
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.1f}ms"
+
+
+def format_report(snap):
+    lines = [f"Uptime: {snap['uptime'] / 3600:.1f}h"]
+    gauges = ", ".join(f"{name}: {value}" for name, value in snap["gauges"].items())
+    if gauges:
+        lines.append(gauges)
+    lag = snap["loop_lag"]
+    lines.append(f"Loop lag p50 {_ms(lag['p50'])} p99 {_ms(lag['p99'])} max {_ms(lag['max'])}")
+    for name, parts in sorted(snap["commands"].items()):
+        rules, io = parts["rules"], parts["io"]
+        lines.append(f"!{name} ×{rules['count']}: rules p50 {_ms(rules['p50'])} p99 {_ms(rules['p99'])}"
+                     f" | io p50 {_ms(io['p50'])} p99 {_ms(io['p99'])}")
+    for name, hist in sorted(snap["timings"].items()):
+        lines.append(f"{name} ×{hist['count']}: p50 {_ms(hist['p50'])} p99 {_ms(hist['p99'])}")
+    return "\n".join(lines)
+
+
+metrics = Metrics()
+# ----------------------------------
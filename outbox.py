@@ -0,0 +1,172 @@
+import asyncio
+import time
+
+# --- Outbound message pipeline ---
+# A command no longer awaits each message as it is produced. It queues them on
+# an Outbox, and when the command finishes the outbox sends:
+#   * every public line for the channel as one message,
+#   * every ephemeral line as one message,
+#   * one DM per player, with different players DMed concurrently.
+# The two channel messages are sent one after the other, in that order.
+# Every send goes through a per-route token bucket (a route is one channel or
+# one DM), so bursts are queued and paced instead of running into 429s. A
+# bucket that has refilled and has nobody waiting is no different from a new
+# one, so those are dropped once per refill period and the number of buckets
+# follows the routes in recent use, not every route ever messaged.
+
+MAX_MESSAGE_LENGTH = 2000
+
+# Discord's per-channel message bucket is roughly 5 messages per 5 seconds,
+# with a global cap of 50 requests per second for the bot.
+ROUTE_RATE = 5
+ROUTE_PER = 5.0
+GLOBAL_RATE = 50
+GLOBAL_PER = 1.0
+
+
+def split_message(content, limit=MAX_MESSAGE_LENGTH):
+    # split on line breaks so merged messages stay under Discord's length limit
+    chunks = []
+    current = ""
+    for line in content.split("\n"):
+        while len(line) > limit:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:limit])
+            line = line[limit:]
+        if current and len(current) + 1 + len(line) > limit:
+            chunks.append(current)
+            current = line
+        else:
+            current = f"{current}\n{line}" if current else line
+    if current or not chunks:
+        chunks.append(current)
+    return chunks
+
+
+class TokenBucket:
+    def __init__(self, rate, per):
+        self.rate = rate
+        self.per = per
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        # the lock keeps waiters in FIFO order, so a route behaves like a queue
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate / self.per)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) * self.per / self.rate)
+
+    def idle(self, now):
+        # refilled to capacity with nobody holding or waiting on the lock
+        return not self.lock.locked() and self.tokens + (now - self.updated) * self.rate / self.per >= self.rate
+
+
+class RateLimiter:
+    def __init__(self, rate=ROUTE_RATE, per=ROUTE_PER, global_rate=GLOBAL_RATE, global_per=GLOBAL_PER):
+        self.rate = rate
+        self.per = per
+        self.routes = {}
+        self.global_bucket = TokenBucket(global_rate, global_per)
+        self.swept = time.monotonic()
+
+    async def acquire(self, route):
+        now = time.monotonic()
+        if now - self.swept >= self.per:
+            self.evict(now)
+        bucket = self.routes.get(route)
+        if bucket is None:
+            bucket = self.routes[route] = TokenBucket(self.rate, self.per)
+        await bucket.acquire()
+        await self.global_bucket.acquire()
+
+    def evict(self, now):
+        self.swept = now
+        for route in [r for r, bucket in self.routes.items() if bucket.idle(now)]:
+            del self.routes[route]
+
+
+class Pipeline:
+    # `transport.send(destination, content, **kwargs)` does the actual send and
+    # returns False when the destination refused it (e.g. closed DMs).
+    def __init__(self, transport, limiter=None):
+        self.transport = transport
+        self.limiter = limiter or RateLimiter()
+
+    async def send(self, route, destination, content, **kwargs):
+        delivered = True
+        for chunk in split_message(content):
+            await self.limiter.acquire(route)
+            delivered = await self.transport.send(destination, chunk, **kwargs) and delivered
+        return delivered
+
+    def outbox(self, ctx):
+        return Outbox(self, ctx)
+
+
+class Outbox:
+    def __init__(self, pipeline, ctx):
+        self.pipeline = pipeline
+        self.ctx = ctx
+        self.public = []
+        self.private = []
+        self.dms = {}
+        self.io_time = 0.0
+
+    def say(self, text):
+        self.public.append(text)
+
+    def whisper(self, text):
+        self.private.append(text)
+
+    def dm(self, member, text):
+        self.dms.setdefault(member, []).append(text)
+
+    async def flush(self):
+        public, private, dms = self.public, self.private, self.dms
+        self.public, self.private, self.dms = [], [], {}
+
+        if not (public or private or dms):
+            return
+        started = time.perf_counter()
+        members = list(dms)
+        dm_sends = asyncio.gather(*(self.pipeline.send(("dm", m.id), m, "\n".join(dms[m])) for m in members))
+        # the channel messages go out in order: a slash command's first reply
+        # is its interaction response, which only one send may claim
+        route = ("channel", self.ctx.channel.id)
+        if public:
+            await self.pipeline.send(route, self.ctx, "\n".join(public))
+        if private:
+            await self.pipeline.send(route, self.ctx, "\n".join(private), ephemeral=True)
+        results = await dm_sends
+        undelivered = [m for m, ok in zip(members, results) if not ok]
+        if undelivered:
+            names = ", ".join(m.display_name for m in undelivered)
+            await self.pipeline.send(route, self.ctx, f"Couldn't DM {names}.")
+        self.io_time += time.perf_counter() - started
+
+
+class FakeTransport:
+    # Local stand-in for Discord: records every send and optionally refuses
+    # DMs to some destinations or adds latency per send.
+    def __init__(self, latency=0.0, refuse=()):
+        self.latency = latency
+        self.refuse = set(refuse)
+        self.sent = []
+
+    async def send(self, destination, content, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if destination in self.refuse:
+            return False
+        self.sent.append((destination, content, kwargs))
+        return True
+# ----------------------------------
@@ -0,0 +1,281 @@
+from bmb import bmb_call, bmb_check, bmb_fold, bmb_raise, new_bmb_game
+import bmb
+from cards import CARD_NAME, DECK_SIZE, GONGZHU_DECK, hand_cards, hand_mask, render_cards
+from deal import shuffled, table_rng
+import gongzhu
+from gongzhu import MATCH_LIMIT, gongzhu_play, new_gongzhu_game
+import landlord
+from landlord import describe, landlord_pass, landlord_play, new_landlord_game
+
+# --- Replays ---
+# A replay is everything needed to play a table back: the deal seed, the
+# seated players and every accepted move, in one compact binary blob:
+#
+#   header  version byte, game byte, varint seed, varint player count, then
+#           per player a zigzag varint id and a length-prefixed UTF-8 name,
+#           then a varint match limit (a Gongzhu match plays until someone's
+#           total reaches minus this; 0 is a single hand). Version 1 headers
+#           have no limit; every Gongzhu table then was a MATCH_LIMIT match.
+#   move    varint (op << 3 | seat), followed by the op's arguments:
+#           Landlord play: varint count + one byte per card
+#           Gongzhu play:  one card byte
+#           BMB raise:     varint amount
+#
+# A typical Landlord game is a few hundred bytes, a whole Gongzhu match a
+# few KB. Playing one back rebuilds the table from its seed (the same way
+# DealPool dealt it) and runs the moves through the rule functions in REPLAY,
+# which is also what the store uses to roll a snapshot forward.
+
+VERSION = 2
+GAMES = ("landlord", "gongzhu", "bmb")
+OPS = ("play", "pass", "raise", "call", "check", "fold")
+OP_CODE = {op: code for code, op in enumerate(OPS)}
+
+REPLAY = {
+    ("landlord", "play"): landlord_play,
+    ("landlord", "pass"): landlord_pass,
+    ("gongzhu", "play"): gongzhu_play,
+    ("bmb", "raise"): bmb_raise,
+    ("bmb", "call"): bmb_call,
+    ("bmb", "check"): bmb_check,
+    ("bmb", "fold"): bmb_fold,
+}
+
+# how the argument after the seat is written, per (game, op)
+CARD_MASK = "mask"
+CARD = "card"
+AMOUNT = "amount"
+ARG_KIND = {
+    ("landlord", "play"): CARD_MASK,
+    ("gongzhu", "play"): CARD,
+    ("bmb", "raise"): AMOUNT,
+}
+
+
+def write_varint(out, n):
+    while n > 0x7F:
+        out.append(n & 0x7F | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def read_varint(data, pos):
+    n = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def encode_header(game, seed, players, limit=None):
+    # players as (id, display name); bot seats have negative ids
+    out = bytearray((VERSION, GAMES.index(game)))
+    write_varint(out, seed)
+    write_varint(out, len(players))
+    for player_id, name in players:
+        write_varint(out, player_id << 1 if player_id >= 0 else (~player_id << 1) | 1)
+        name = name.encode()
+        write_varint(out, len(name))
+        out += name
+    write_varint(out, -limit if limit is not None else 0)
+    return out
+
+
+def decode_header(data):
+    # (game, seed, players, match limit, offset of the first move)
+    if data[0] not in (1, VERSION):
+        raise ValueError(f"unknown replay version {data[0]}")
+    game = GAMES[data[1]]
+    seed, pos = read_varint(data, 2)
+    count, pos = read_varint(data, pos)
+    players = []
+    for _ in range(count):
+        z, pos = read_varint(data, pos)
+        size, pos = read_varint(data, pos)
+        players.append((~(z >> 1) if z & 1 else z >> 1, bytes(data[pos:pos + size]).decode()))
+        pos += size
+    if data[0] == 1:
+        limit = MATCH_LIMIT if game == "gongzhu" else None
+    else:
+        limit, pos = read_varint(data, pos)
+        limit = -limit if limit else None
+    return game, seed, players, limit, pos
+
+
+def encode_move(out, game, op, seat, *args):
+    out.append(OP_CODE[op] << 3 | seat)
+    kind = ARG_KIND.get((game, op))
+    if kind == CARD_MASK:
+        cards = hand_cards(args[0])
+        write_varint(out, len(cards))
+        out += bytes(cards)
+    elif kind == CARD:
+        out.append(args[0])
+    elif kind == AMOUNT:
+        write_varint(out, args[0])
+
+
+def decode_moves(data, game, pos):
+    # yields (op, args) with args exactly as the rule function takes them
+    end = len(data)
+    while pos < end:
+        head = data[pos]
+        op = OPS[head >> 3]
+        seat = head & 7
+        pos += 1
+        kind = ARG_KIND.get((game, op))
+        if kind == CARD_MASK:
+            count, pos = read_varint(data, pos)
+            yield op, (seat, hand_mask(data[pos:pos + count]))
+            pos += count
+        elif kind == CARD:
+            yield op, (seat, data[pos])
+            pos += 1
+        elif kind == AMOUNT:
+            amount, pos = read_varint(data, pos)
+            yield op, (seat, amount)
+        else:
+            yield op, (seat,)
+
+
+# --- Playback ---
+class ReplayPlayer:
+    # stands in for a member while a replay is played back
+    def __init__(self, id, display_name):
+        self.id = id
+        self.display_name = display_name
+
+
+# the table as the cogs started it; this mirrors DealPool._make. Only
+# Gongzhu has a match limit.
+def start_landlord(players, seed, limit=None):
+    rng = table_rng(seed)
+    return new_landlord_game(players, rng, shuffled(range(DECK_SIZE), rng))
+
+
+def start_gongzhu(players, seed, limit=None):
+    rng = table_rng(seed)
+    return new_gongzhu_game(players, rng, limit, shuffled(GONGZHU_DECK, rng))
+
+
+def start_bmb(players, seed, limit=None):
+    return new_bmb_game(players, table_rng(seed))
+
+
+STARTS = {"landlord": start_landlord, "gongzhu": start_gongzhu, "bmb": start_bmb}
+
+
+def play_back(data):
+    # yields (state, op, args, events) for every move, after it was applied
+    game, seed, players, limit, pos = decode_header(data)
+    state = STARTS[game]([ReplayPlayer(*p) for p in players], seed, limit)
+    yield state, None, (), ()
+    for op, args in decode_moves(data, game, pos):
+        yield state, op, args, REPLAY[(game, op)](state, *args)
+
+
+def gongzhu_deals(data):
+    # yields (hands as dealt, all hearts dealt, [(seat, card)] in play order,
+    # scores) for every finished hand of a Gongzhu replay
+    moves = play_back(data)
+    state = next(moves)[0]
+    hands, all_hearts, plays = list(state.hands), state.all_hearts, []
+    for state, op, args, events in moves:
+        plays.append(args)
+        for event in events:
+            if event[0] == gongzhu.HAND_OVER:
+                yield hands, all_hearts, plays, event[1]
+            elif event[0] == gongzhu.NEW_HAND:
+                hands, all_hearts, plays = list(state.hands), state.all_hearts, []
+
+
+def summarize(data):
+    # the replay as text lines, one per move or finished trick / round
+    game = GAMES[data[1]]
+    return SUMMARIES[game](play_back(data))
+
+
+def _names(state):
+    return [p.display_name for p in state.players]
+
+
+def summarize_landlord(moves):
+    state = next(moves)[0]
+    names = _names(state)
+    for seat, name in enumerate(names):
+        yield f"{name} was dealt: {render_cards(hand_cards(state.hands[seat]))}"
+    for state, op, args, events in moves:
+        for event in events:
+            if event[0] == landlord.PLAYED:
+                _, seat, play, combo = event
+                yield f"{names[seat]}: {render_cards(hand_cards(play))} ({describe(combo)})"
+            elif event[0] == landlord.PASSED:
+                yield f"{names[event[1]]}: pass"
+            elif event[0] == landlord.WON:
+                yield f"{names[event[1]]} wins."
+
+
+def summarize_gongzhu(moves):
+    state = next(moves)[0]
+    names = _names(state)
+    hand = 1
+    trick = []
+    yield "Hand 1"
+    for state, op, args, events in moves:
+        for event in events:
+            kind = event[0]
+            if kind == gongzhu.PLAYED:
+                trick.append(f"{names[event[1]]} {CARD_NAME[event[2]]}")
+            elif kind == gongzhu.TRICK:
+                yield f"{', '.join(trick)} → {names[event[1]]}"
+                trick = []
+            elif kind == gongzhu.HAND_OVER:
+                yield "Scores: " + ", ".join(f"{name} {score:+d}" for name, score in zip(names, event[1]))
+            elif kind == gongzhu.NEW_HAND:
+                hand += 1
+                yield f"Hand {hand}"
+            elif kind == gongzhu.GAME_OVER:
+                yield "Totals: " + ", ".join(f"{name} {total}" for name, total in zip(names, state.totals))
+
+
+def summarize_bmb(moves):
+    state = next(moves)[0]
+    names = _names(state)
+    line = _bmb_round(state, names, 1)
+    rounds = 1
+    for state, op, args, events in moves:
+        line.append(f"{names[args[0]]} {op}s" + (f" {args[1]}" if op == "raise" else ""))
+        for event in events:
+            kind = event[0]
+            if kind in (bmb.WON_POT, bmb.WON_SHORT):
+                line.append(f"{names[event[1]]} takes {event[2]}")
+            elif kind == bmb.SPLIT:
+                line.append("split")
+            elif kind == bmb.FOLDED:
+                line.append(f"{names[event[2]]} takes {event[3]}")
+            elif kind == bmb.NEW_ROUND:
+                yield _bmb_line(line)
+                rounds += 1
+                line = _bmb_round(state, names, rounds)
+            elif kind == bmb.GAME_OVER:
+                yield _bmb_line(line)
+                yield f"{names[event[2]]} wins after {rounds} round(s)."
+                line = None
+    if line and len(line) > 1:
+        yield _bmb_line(line)
+
+
+def _bmb_round(state, names, number):
+    cards = " / ".join(f"{name} {CARD_NAME[card]}" for name, card in zip(names, state.cards))
+    return [f"Round {number} ({cards}):"]
+
+
+def _bmb_line(line):
+    return f"{line[0]} {', '.join(line[1:])}"
+
+
+SUMMARIES = {"landlord": summarize_landlord, "gongzhu": summarize_gongzhu, "bmb": summarize_bmb}
+# ----------------------------------
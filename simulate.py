@@ -0,0 +1,129 @@
+import argparse
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bmb import ACTIONS, BMB_ANTE, NEW_ROUND, RAISE, bot_action, legal_actions, new_bmb_game
+from cards import hand_cards
+from gongzhu import gongzhu_play, legal_cards, new_gongzhu_game
+from landlord import landlord_pass, landlord_play, new_landlord_game
+from landlord_ai import quick_move
+
+# --- Headless self-play ---
+# Plays games straight through the rule modules, no Discord involved. Every
+# game gets its own RNG seeded from (--seed, game index), so a run is
+# reproducible regardless of how many worker processes share the work.
+#
+#   python simulate.py landlord --games 100000 --players 3 --workers 8 --seed 1
+
+MAX_BMB_ACTIONS = 10000
+BMB_EXPLORE = 0.2
+
+
+def play_landlord(rng, players):
+    state = new_landlord_game(range(players), rng)
+    turns = 0
+    while state.winner is None:
+        seat = state.turn
+        last = state.last_play[2] if state.last_play else None
+        move = quick_move(state.hands[seat], last, rng)
+        if move:
+            landlord_play(state, seat, move)
+        else:
+            landlord_pass(state, seat)
+        turns += 1
+    return {"winner": state.winner, "turns": turns}
+
+
+def play_gongzhu(rng, players):
+    state = new_gongzhu_game(range(players), rng)
+    while not state.finished:
+        seat = state.turn
+        gongzhu_play(state, seat, rng.choice(hand_cards(legal_cards(state, seat))))
+    return {"scores": state.scores}
+
+
+def play_bmb(rng, players=2):
+    state = new_bmb_game(range(2), rng)
+    rounds = 1
+    for _ in range(MAX_BMB_ACTIONS):
+        if state.winner is not None:
+            break
+        seat = state.turn
+        # the bot policy, with a random legal action mixed in now and then
+        action, args = bot_action(state, seat)
+        if rng.random() < BMB_EXPLORE:
+            action = rng.choice(legal_actions(state, seat))
+            args = (BMB_ANTE,) if action == RAISE else ()
+        events = ACTIONS[action](state, seat, *args)
+        rounds += sum(1 for e in events if e[0] == NEW_ROUND)
+    return {"winner": state.winner, "rounds": rounds}
+
+
+GAMES = {"landlord": play_landlord, "gongzhu": play_gongzhu, "bmb": play_bmb}
+
+
+def run_batch(game, players, seed, start, count):
+    play = GAMES[game]
+    results = []
+    for index in range(start, start + count):
+        results.append(play(random.Random(f"{seed}:{index}"), players))
+    return results
+
+
+def summarize(game, players, results):
+    lines = []
+    if game == "landlord":
+        wins = [0] * players
+        for r in results:
+            wins[r["winner"]] += 1
+        lines.append("win rate by seat: " + ", ".join(f"{w / len(results):.3f}" for w in wins))
+        lines.append(f"average turns: {sum(r['turns'] for r in results) / len(results):.1f}")
+    elif game == "gongzhu":
+        totals = [0] * players
+        for r in results:
+            for seat, score in enumerate(r["scores"]):
+                totals[seat] += score
+        lines.append("average score by seat: " + ", ".join(f"{t / len(results):.1f}" for t in totals))
+    else:
+        wins = [0, 0, 0]
+        for r in results:
+            wins[r["winner"] if r["winner"] is not None else 2] += 1
+        lines.append(f"wins: seat 0 {wins[0]}, seat 1 {wins[1]}, unfinished {wins[2]}")
+        lines.append(f"average rounds: {sum(r['rounds'] for r in results) / len(results):.1f}")
+    return lines
+
+
+def simulate(game, games, players, workers=None, seed=0, chunk=1000):
+    started = time.perf_counter()
+    results = []
+    if workers == 1:
+        results = run_batch(game, players, seed, 0, games)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            jobs = [pool.submit(run_batch, game, players, seed, start, min(chunk, games - start))
+                    for start in range(0, games, chunk)]
+            for job in jobs:
+                results += job.result()
+    elapsed = time.perf_counter() - started
+    return results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless self-play for the card games")
+    parser.add_argument("game", choices=sorted(GAMES))
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--players", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    players = 2 if args.game == "bmb" else args.players
+    results, elapsed = simulate(args.game, args.games, players, args.workers, args.seed)
+    print(f"{args.game}: {len(results)} games in {elapsed:.2f}s ({len(results) / elapsed:,.0f} games/s)")
+    for line in summarize(args.game, players, results):
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+import os
+import pickle
+import queue
+import sqlite3
+import struct
+import threading
+import time
+
+from replay import REPLAY, encode_header, encode_move
+
+# --- Persistent game state ---
+# Every successful transition is appended to a SQLite write-ahead log as
+# (table, game, op, packed int args). Every SNAPSHOT_EVERY ops, and whenever a
+# table starts, the whole state is written as a snapshot and that table's log
+# is cleared. Restoring a table therefore means unpickling one small state and
+# replaying at most SNAPSHOT_EVERY ops through the same rule functions.
+#
+# Finished games update `player_stats`, one row per (guild, game, player)
+# with running totals. The rows are upserted by the writer like everything
+# else, and each leaderboard order has its own index, so a leaderboard is a
+# short index scan however many games have been recorded.
+#
+# Every table is also recorded as a replay (see replay.py) in the `replays`
+# archive, which is never cleared: the deal seed, the players and each move,
+# as one binary blob. The archive is indexed by table, by player (through
+# `replay_players`) and by start time, and it is the audit trail for
+# disputes. The writer keeps the blob of every running table in memory and
+# rewrites it once per transaction it changed in.
+#
+# The event loop only pickles/packs and puts onto a queue; a single writer
+# thread owns the connection and commits whatever has queued up as one
+# transaction, so nothing on the loop waits on disk. A transaction that
+# fails (a lock held past BUSY_TIMEOUT, a full disk) is rolled back and
+# retried; the writer never dies, so later writes still get through.
+
+DB_PATH = os.getenv("GAME_DB", "games.db")
+SNAPSHOT_EVERY = 50
+BUSY_TIMEOUT = 30.0
+WRITE_ATTEMPTS = 3  # a batch that still fails after this is logged and dropped
+RETRY_DELAY = 1.0
+
+# what each game's leaderboard is ranked by: Landlord wins, the average
+# Gongzhu match total and BMB net chips
+LEADERBOARD_ORDER = {"landlord": "wins", "gongzhu": "average", "bmb": "total"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS log (
+    id INTEGER PRIMARY KEY,
+    guild INTEGER,
+    channel INTEGER NOT NULL,
+    game TEXT NOT NULL,
+    op TEXT NOT NULL,
+    args BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS log_table ON log (channel, game, id);
+CREATE TABLE IF NOT EXISTS snapshots (
+    channel INTEGER NOT NULL,
+    game TEXT NOT NULL,
+    guild INTEGER,
+    state BLOB NOT NULL,
+    PRIMARY KEY (channel, game)
+);
+CREATE TABLE IF NOT EXISTS replays (
+    id INTEGER PRIMARY KEY,
+    guild INTEGER,
+    channel INTEGER NOT NULL,
+    game TEXT NOT NULL,
+    seed INTEGER NOT NULL,
+    started REAL NOT NULL,
+    ended REAL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS replays_table ON replays (channel, game, id);
+CREATE INDEX IF NOT EXISTS replays_started ON replays (started);
+CREATE TABLE IF NOT EXISTS replay_players (
+    player INTEGER NOT NULL,
+    replay INTEGER NOT NULL,
+    PRIMARY KEY (player, replay)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS replay_players_replay ON replay_players (replay);
+CREATE TABLE IF NOT EXISTS player_stats (
+    guild INTEGER NOT NULL,
+    game TEXT NOT NULL,
+    player INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    played INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    average REAL NOT NULL,
+    PRIMARY KEY (guild, player, game)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS player_stats_wins ON player_stats (guild, game, wins);
+CREATE INDEX IF NOT EXISTS player_stats_total ON player_stats (guild, game, total);
+CREATE INDEX IF NOT EXISTS player_stats_average ON player_stats (guild, game, average);
+"""
+
+
+def pack_args(args):
+    return struct.pack(f"<{len(args)}q", *args)
+
+
+def unpack_args(blob):
+    return struct.unpack(f"<{len(blob) // 8}q", blob)
+
+
+def dump_state(state):
+    # players are stored as (id, display name); everything else pickles as is
+    data = dict(vars(state))
+    data["players"] = [(p.id, p.display_name) for p in state.players]
+    return pickle.dumps((type(state), data), protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load_state(blob, make_player):
+    cls, data = pickle.loads(blob)
+    state = cls.__new__(cls)
+    data["players"] = [make_player(player_id, name) for player_id, name in data["players"]]
+    state.__dict__.update(data)
+    return state
+
+
+def connect(path):
+    # several shard processes may share one database; wait out their write locks
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=BUSY_TIMEOUT)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class GameStore:
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self.queue = queue.Queue()
+        self.pending = {}
+        self.reader = None
+        self.read_lock = threading.Lock()
+        connect(path).close()
+        self.thread = threading.Thread(target=self._writer, name="game-store", daemon=True)
+        self.thread.start()
+
+    # --- called from the event loop ---
+    def record(self, key, game, state, op, *args):
+        self.queue.put(("log", key, game, op, pack_args(args)))
+        ops = self.pending.get((key, game), 0) + 1
+        if ops >= SNAPSHOT_EVERY:
+            self.snapshot(key, game, state)
+        else:
+            self.pending[(key, game)] = ops
+
+    def snapshot(self, key, game, state):
+        self.pending[(key, game)] = 0
+        self.queue.put(("snapshot", key, game, dump_state(state)))
+
+    def record_deal(self, key, game, seed, state):
+        # starts the table's replay; call it before the first record()
+        players = [(p.id, p.display_name) for p in state.players]
+        header = encode_header(game, seed, players, getattr(state, "limit", None))
+        self.queue.put(("deal", key, game, seed, time.time(), [p[0] for p in players], header))
+
+    def record_results(self, key, game, results):
+        # results: (player id, display name, won, total) per human seat, where
+        # total is what the game adds up (Gongzhu score, BMB net chips)
+        self.queue.put(("results", key, game, results))
+
+    def end(self, key, game):
+        self.pending.pop((key, game), None)
+        self.queue.put(("end", key, game))
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.reader is not None:
+            self.reader.close()
+
+    # --- writer thread ---
+    def _writer(self):
+        conn = connect(self.path)
+        self.live = {}  # (channel, game) -> [replay id, blob] of running tables
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                running = False
+                batch = [item for item in batch if item is not None]
+            for attempt in range(1, WRITE_ATTEMPTS + 1):
+                try:
+                    self._commit(conn, batch)
+                    break
+                except Exception as e:
+                    # the transaction rolled back; so must the replay blobs it had changed in memory
+                    self.live.clear()
+                    if attempt == WRITE_ATTEMPTS:
+                        print(f"Game store: dropped {len(batch)} write(s) after {attempt} attempts: {e!r}")
+                    else:
+                        print(f"Game store: write failed ({e!r}), retrying")
+                        time.sleep(RETRY_DELAY * attempt)
+        conn.close()
+
+    def _commit(self, conn, batch):
+        changed = set()
+        with conn:
+            for item in batch:
+                self._apply(conn, item, changed)
+            for table in changed:
+                live = self.live.get(table)
+                if live:
+                    conn.execute("UPDATE replays SET data = ? WHERE id = ?", (bytes(live[1]), live[0]))
+
+    def _apply(self, conn, item, changed):
+        kind, (guild, channel), game = item[:3]
+        if kind == "log":
+            op, args = item[3:]
+            conn.execute("INSERT INTO log (guild, channel, game, op, args) VALUES (?, ?, ?, ?, ?)",
+                         (guild, channel, game, op, args))
+            live = self._live_replay(conn, channel, game)
+            if live:
+                encode_move(live[1], game, op, *unpack_args(args))
+                changed.add((channel, game))
+        elif kind == "snapshot":
+            conn.execute("DELETE FROM log WHERE channel = ? AND game = ?", (channel, game))
+            conn.execute("INSERT OR REPLACE INTO snapshots (channel, game, guild, state) VALUES (?, ?, ?, ?)",
+                         (channel, game, guild, item[3]))
+        elif kind == "deal":
+            seed, started, player_ids, header = item[3:]
+            self._end_replay(conn, channel, game)
+            replay_id = conn.execute(
+                "INSERT INTO replays (guild, channel, game, seed, started, data) VALUES (?, ?, ?, ?, ?, ?)",
+                (guild, channel, game, seed, started, bytes(header))).lastrowid
+            conn.executemany("INSERT OR IGNORE INTO replay_players (player, replay) VALUES (?, ?)",
+                             [(player_id, replay_id) for player_id in player_ids])
+            self.live[(channel, game)] = [replay_id, header]
+        elif kind == "results":
+            # DMs have no guild; the stats key them under 0
+            conn.executemany(
+                "INSERT INTO player_stats (guild, game, player, name, played, wins, total, average)"
+                " VALUES (?, ?, ?, ?, 1, ?, ?, ?)"
+                " ON CONFLICT (guild, player, game) DO UPDATE SET name = excluded.name, played = played + 1,"
+                " wins = wins + excluded.wins, total = total + excluded.total,"
+                " average = (total + excluded.total) * 1.0 / (played + 1)",
+                [(guild or 0, game, player_id, name, int(won), total, total)
+                 for player_id, name, won, total in item[3]])
+        elif kind == "end":
+            conn.execute("DELETE FROM log WHERE channel = ? AND game = ?", (channel, game))
+            conn.execute("DELETE FROM snapshots WHERE channel = ? AND game = ?", (channel, game))
+            self._end_replay(conn, channel, game)
+
+    def _live_replay(self, conn, channel, game):
+        # after a restart the blob of a running table is read back on its first move
+        table = (channel, game)
+        if table not in self.live:
+            row = conn.execute("SELECT id, data FROM replays WHERE channel = ? AND game = ? AND ended IS NULL"
+                               " ORDER BY id DESC LIMIT 1", (channel, game)).fetchone()
+            self.live[table] = [row[0], bytearray(row[1])] if row else None
+        return self.live[table]
+
+    def _end_replay(self, conn, channel, game):
+        live = self._live_replay(conn, channel, game)
+        if live:
+            conn.execute("UPDATE replays SET data = ?, ended = ? WHERE id = ?", (bytes(live[1]), time.time(), live[0]))
+        self.live.pop((channel, game), None)
+
+    # --- startup ---
+    def restore(self, make_player, owns=None):
+        # yields (key, game, state) for every table that was still running;
+        # `owns(guild_id)` limits that to the guilds this process serves
+        conn = connect(self.path)
+        try:
+            logs = {}
+            for guild, channel, game, op, args in conn.execute(
+                    "SELECT guild, channel, game, op, args FROM log ORDER BY channel, game, id"):
+                if owns is None or owns(guild):
+                    logs.setdefault((channel, game), []).append((op, args))
+
+            for channel, game, guild, blob in conn.execute("SELECT channel, game, guild, state FROM snapshots"):
+                if owns is not None and not owns(guild):
+                    continue
+                try:
+                    state = load_state(blob, make_player)
+                    for op, args in logs.get((channel, game), ()):
+                        REPLAY[(game, op)](state, *unpack_args(args))
+                except Exception as e:
+                    # a log that no longer replays must not keep the bot from starting; drop the table
+                    print(f"Dropping {game} table in channel {channel}: {e!r}")
+                    self.end((guild, channel), game)
+                    continue
+                yield (guild, channel), game, state
+        finally:
+            conn.close()
+
+    # --- reads (blocking, run them in a thread) ---
+    def _read(self, sql, params=()):
+        with self.read_lock:
+            if self.reader is None:
+                self.reader = connect(self.path)
+                self.reader.execute("PRAGMA query_only=ON")
+            return self.reader.execute(sql, params).fetchall()
+
+    def find_replays(self, guild=None, channel=None, player=None, since=None, until=None, limit=10, game=None,
+                     finished=False):
+        # newest first, as (id, game, started, ended, player ids); `finished`
+        # leaves out the tables still running
+        sql = "SELECT id, game, started, ended FROM replays"
+        where = ["guild IS ?"]
+        params = [guild]
+        if player is not None:
+            sql += " JOIN replay_players ON replay = id"
+            where.append("player = ?")
+            params.append(player)
+        if channel is not None:
+            where.append("channel = ?")
+            params.append(channel)
+        if game is not None:
+            where.append("game = ?")
+            params.append(game)
+        if finished:
+            where.append("ended IS NOT NULL")
+        if since is not None:
+            where.append("started >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("started < ?")
+            params.append(until)
+        sql += f" WHERE {' AND '.join(where)} ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        rows = self._read(sql, params)
+        if not rows:
+            return []
+        # the players of every row in one query
+        players = {}
+        ids = [row[0] for row in rows]
+        marks = ", ".join("?" * len(ids))
+        for replay_id, player in self._read("SELECT replay, player FROM replay_players"
+                                            f" WHERE replay IN ({marks}) ORDER BY replay, player", ids):
+            players.setdefault(replay_id, []).append(player)
+        return [row + (tuple(players.get(row[0], ())),) for row in rows]
+
+    def load_replay(self, replay_id, guild=None, finished=False):
+        sql = "SELECT data FROM replays WHERE id = ? AND guild IS ?"
+        if finished:
+            sql += " AND ended IS NOT NULL"
+        rows = self._read(sql, (replay_id, guild))
+        return rows[0][0] if rows else None
+
+    def player_stats(self, guild, player):
+        # (game, played, wins, total, average) for every game the player finished here
+        return self._read("SELECT game, played, wins, total, average FROM player_stats"
+                          " WHERE guild = ? AND player = ? ORDER BY game", (guild or 0, player))
+
+    def leaderboard(self, guild, game, limit=10):
+        # best first, as (player, name, played, wins, total, average)
+        order = LEADERBOARD_ORDER[game]
+        return self._read("SELECT player, name, played, wins, total, average FROM player_stats"
+                          f" WHERE guild = ? AND game = ? ORDER BY {order} DESC LIMIT ?", (guild or 0, game, limit))
+# ----------------------------------
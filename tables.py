@@ -0,0 +1,98 @@
+import asyncio
+import os
+
+from store import GameStore
+from timers import TimerWheel
+
+# --- Table registry ---
+# Every (guild, channel) pair can host its own table of each game, so one
+# process serves any number of concurrent games. The tables are the rule
+# states from landlord.py, gongzhu.py and bmb.py; `players` holds the members
+# (PlayerRefs for tables restored from the store).
+#
+# This is the state the game extensions in cogs/ share with bot.py; the
+# extensions fill in AUTO_MOVES, HAND_VIEWS, TABLE_STARTS, TABLE_SIZES and
+# TABLE_STATUS for their game when loaded.
+landlord_tables = {}
+gongzhu_tables = {}
+bmb_tables = {}
+registries = {"landlord": landlord_tables, "gongzhu": gongzhu_tables, "bmb": bmb_tables}
+
+AUTO_MOVES = {}  # game -> async (ctx, key, table, seat) making the move for an idle seat
+HAND_VIEWS = {}  # game -> (table, seat) -> the seat's hand as text for !hand
+TABLE_STARTS = {}  # game -> async (ctx, key, players) starting a table; players may include BotSeats
+TABLE_SIZES = {}  # game -> (smallest, largest, usual) number of seats, for !queue
+TABLE_STATUS = {}  # game -> table -> summary text for the table's status message (see ui.py)
+stale_status = set()  # (game, key) of tables changed since their status message was last edited
+
+# every transition is also written to the local game store so tables survive a restart
+store = GameStore()
+
+# one timer wheel runs the turn timeout of every table (TURN_TIMEOUT=0 turns it off)
+TURN_TIMEOUT = float(os.getenv("TURN_TIMEOUT", "120"))
+MAX_IDLE_TURNS = 6  # turns in a row that timed out before the table is closed
+turn_timers = TimerWheel()
+idle_turns = {}
+background_tasks = set()
+
+
+def table_key(ctx):
+    guild_id = ctx.guild.id if ctx.guild else None
+    return (guild_id, ctx.channel.id)
+
+
+def seat_of(table, player):
+    for seat, p in enumerate(table.players):
+        if p.id == player.id:
+            return seat
+    return None
+
+
+def end_table(game, key):
+    registries[game].pop(key, None)
+    stale_status.add((game, key))
+    store.end(key, game)
+    turn_timers.cancel((game, key))
+    idle_turns.pop((game, key), None)
+
+
+def arm_timer(game, key):
+    if TURN_TIMEOUT > 0:
+        turn_timers.schedule((game, key), TURN_TIMEOUT)
+
+
+def record_move(key, game, table, op, *args):
+    # every accepted move is logged and restarts the table's turn timer
+    store.record(key, game, table, op, *args)
+    stale_status.add((game, key))
+    idle_turns.pop((game, key), None)
+    arm_timer(game, key)
+
+
+def record_results(key, game, table, winners, totals=None):
+    # player stats for the human seats of a finished table
+    results = [(p.id, p.display_name, seat in winners, totals[seat] if totals else 0)
+               for seat, p in enumerate(table.players) if not isinstance(p, BotSeat)]
+    if results:
+        store.record_results(key, game, results)
+
+
+def spawn(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+
+class BotSeat:
+    # stands in for a discord.Member at a table
+    def __init__(self, number):
+        self.id = -number
+        self.display_name = f"Bot {number}"
+        self.mention = self.display_name
+
+
+def send_hand(ctx, player, hand_text):
+    if isinstance(player, BotSeat):
+        return
+    ctx.outbox.dm(player, f"Your current hand:\n{hand_text}")
+# ----------------------------------
@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+# --- Turn timers ---
+# One hashed timing wheel drives the turn timeout of every table. The wheel is
+# a ring of SLOTS buckets, each TICK seconds wide; a timer lives in the bucket
+# its deadline falls into, plus a count of full turns of the ring still to
+# wait for deadlines further out than one revolution. Scheduling, rescheduling
+# and cancelling are dict operations, and a tick only looks at the one bucket
+# the cursor moves onto, so the cost per tick doesn't grow with the number of
+# tables. A single task advances the wheel for the whole process.
+
+TICK = 1.0
+SLOTS = 512  # one revolution is ~8.5 minutes at 1s per tick
+
+
+class TimerWheel:
+    def __init__(self, tick=TICK, slots=SLOTS):
+        self.tick = tick
+        self.slots = [{} for _ in range(slots)]  # key -> revolutions left
+        self.where = {}  # key -> slot index
+        self.cursor = 0
+
+    def __len__(self):
+        return len(self.where)
+
+    def schedule(self, key, delay):
+        # (re)arm `key` to fire after `delay` seconds, rounded up to a tick
+        self.cancel(key)
+        ticks = max(1, -int(-delay // self.tick))
+        slot = (self.cursor + ticks) % len(self.slots)
+        self.slots[slot][key] = (ticks - 1) // len(self.slots)
+        self.where[key] = slot
+
+    def cancel(self, key):
+        slot = self.where.pop(key, None)
+        if slot is not None:
+            del self.slots[slot][key]
+
+    def advance(self):
+        # move one tick forward and return the keys that expired
+        self.cursor = (self.cursor + 1) % len(self.slots)
+        bucket = self.slots[self.cursor]
+        due = []
+        for key, revolutions in list(bucket.items()):
+            if revolutions:
+                bucket[key] = revolutions - 1
+            else:
+                del bucket[key]
+                del self.where[key]
+                due.append(key)
+        return due
+
+    async def run(self, expire):
+        # calls `expire(key)` for every timer that runs out; a late wakeup
+        # catches up tick by tick so no deadline is skipped
+        next_tick = time.monotonic() + self.tick
+        while True:
+            await asyncio.sleep(max(next_tick - time.monotonic(), 0.0))
+            while next_tick <= time.monotonic():
+                next_tick += self.tick
+                for key in self.advance():
+                    expire(key)
+# ----------------------------------
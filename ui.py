@@ -0,0 +1,173 @@
+import time
+from collections import deque
+
+import discord
+
+from cards import CARD_NAME
+from metrics import metrics
+from outbox import MAX_MESSAGE_LENGTH, Pipeline
+from tables import TABLE_STATUS, registries, seat_of, stale_status, table_key
+
+# --- Discord output ---
+class DiscordTransport:
+    # a failed send is reported as undelivered and never raises, so the rest
+    # of a command's queued messages still go out
+    async def send(self, destination, content, **kwargs):
+        started = time.perf_counter()
+        try:
+            await destination.send(content, **kwargs)
+        except discord.Forbidden:
+            return False
+        except discord.HTTPException as e:
+            print(f"Send failed ({e.status}): {e}")
+            return False
+        finally:
+            metrics.observe("discord send", time.perf_counter() - started)
+        return True
+
+pipeline = Pipeline(DiscordTransport())
+
+
+# --- Table status and components ---
+# Every table started by a cog gets one status message in its channel. The
+# message has the game's buttons (a persistent view, so they keep working
+# after a restart) and is edited in place.
+#
+# A move made through a component never posts a channel message:
+#   * the public lines it produces go into the status message, which keeps
+#     the last STATUS_LINES of them above the table's TABLE_STATUS summary;
+#   * private lines replace the player's ephemeral card menu, or become an
+#     ephemeral follow-up when the move came from a button.
+# Card menus carry card ids as option values, so a move goes to the rule
+# functions without being parsed.
+#
+# Typed commands still answer with messages as before. The tables they
+# touched are marked in stale_status, and the status message is refreshed
+# once after the command.
+STATUS_LINES = 12
+HAND_MENU_TIMEOUT = 300.0
+MAX_MENU_OPTIONS = 25  # Discord's limit; no hand in these games is bigger
+
+TABLE_VIEWS = {}  # game -> the persistent discord.ui.View of its status message
+status_messages = {}  # (game, key) -> the table's status message
+status_logs = {}  # (game, key) -> its last STATUS_LINES public lines
+
+
+def status_text(game, key):
+    table = registries[game].get(key)
+    status = TABLE_STATUS[game](table) if table else "This game is over."
+    log = status_logs.get((game, key))
+    text = "\n".join(log) + "\n\n" + status if log else status
+    return text[-MAX_MESSAGE_LENGTH:]
+
+
+async def post_status(ctx, game, key):
+    # the start of a table; its opening lines have already gone out as a message
+    status_logs[(game, key)] = deque(maxlen=STATUS_LINES)
+    await ctx.outbox.pipeline.limiter.acquire(("channel", ctx.channel.id))
+    status_messages[(game, key)] = await ctx.channel.send(status_text(game, key), view=TABLE_VIEWS[game])
+
+
+def add_status_lines(game, key, lines):
+    if lines:
+        status_logs.setdefault((game, key), deque(maxlen=STATUS_LINES)).extend("\n".join(lines).split("\n"))
+        stale_status.add((game, key))
+
+
+async def edit_status(game, key):
+    stale_status.discard((game, key))
+    message = status_messages.get((game, key))
+    if message is None:
+        return
+    over = key not in registries[game]
+    content = status_text(game, key)
+    if over:
+        status_messages.pop((game, key), None)
+        status_logs.pop((game, key), None)
+    await pipeline.limiter.acquire(("channel", message.channel.id))
+    try:
+        await message.edit(content=content, view=None if over else TABLE_VIEWS[game])
+    except discord.HTTPException:
+        status_messages.pop((game, key), None)
+
+
+async def refresh_status(key):
+    # edits the status of every table in this channel a move has touched
+    for game in TABLE_VIEWS:
+        if (game, key) in stale_status:
+            await edit_status(game, key)
+
+
+class InteractionContext:
+    # stands in for ctx when a move comes from a button or menu
+    def __init__(self, interaction, game, from_menu=False):
+        self.interaction = interaction
+        self.author = interaction.user
+        self.guild = interaction.guild
+        self.channel = interaction.channel
+        self.game = game
+        self.from_menu = from_menu
+        self.outbox = pipeline.outbox(self)
+
+    async def send(self, content, ephemeral=False, **kwargs):
+        if not ephemeral:
+            # only reached when a move flushes part way through, e.g. before a bot thinks
+            add_status_lines(self.game, table_key(self), [content])
+            await edit_status(self.game, table_key(self))
+        elif self.from_menu:
+            await self.interaction.edit_original_response(content=content, view=None)
+        else:
+            await self.interaction.followup.send(content, ephemeral=True)
+
+
+def seated(interaction, game, on_status=True):
+    # (key, table, seat) for whoever used a component; seat is None when they
+    # aren't playing. After a restart, a click on the status message is how
+    # that message is found again.
+    key = table_key(interaction)
+    table = registries[game].get(key)
+    if table is None:
+        return key, None, None
+    if on_status:
+        status_messages.setdefault((game, key), interaction.message)
+    return key, table, seat_of(table, interaction.user)
+
+
+async def component_move(interaction, game, move, *args, from_menu=False):
+    # runs `await move(ctx, key, table, seat, *args)` for the player whose turn it is
+    started = time.perf_counter()
+    key, table, seat = seated(interaction, game, not from_menu)
+    if seat is None or seat != table.turn:
+        await interaction.response.send_message("It's not your turn or you're not in this game.", ephemeral=True)
+        return
+    await interaction.response.defer()
+    ctx = InteractionContext(interaction, game, from_menu)
+    await move(ctx, key, table, seat, *args)
+    # public lines go into the status message instead of a new message
+    add_status_lines(game, key, ctx.outbox.public)
+    ctx.outbox.public = []
+    await ctx.outbox.flush()
+    await refresh_status(key)
+    metrics.record_command(f"{game} components", time.perf_counter() - started, ctx.outbox.io_time)
+
+
+class CardMenu(discord.ui.Select):
+    # a player's cards; `move(ctx, key, table, seat, cards)` plays the chosen ones
+    def __init__(self, game, cards, move, max_values=1, placeholder="Choose a card"):
+        options = [discord.SelectOption(label=CARD_NAME[c], value=str(c)) for c in cards[:MAX_MENU_OPTIONS]]
+        super().__init__(placeholder=placeholder, min_values=1, max_values=min(max_values, len(options)),
+                         options=options)
+        self.game = game
+        self.move = move
+
+    async def callback(self, interaction):
+        cards = [int(value) for value in self.values]
+        await component_move(interaction, self.game, self.move, cards, from_menu=True)
+
+
+async def send_card_menu(interaction, game, text, cards, move, max_values=1, placeholder="Choose a card"):
+    view = discord.ui.View(timeout=HAND_MENU_TIMEOUT)
+    if cards:
+        view.add_item(CardMenu(game, cards, move, max_values, placeholder))
+    await interaction.response.send_message(text, view=view, ephemeral=True)
+# ----------------------------------